@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+
+"""
+Benchmarky importu infolistov.
+
+Spustenie: python -m bench --help
+"""
+
+from __future__ import print_function
+
+import imp
+import os.path
+
+IMPORT_PY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                         'import.py')
+SCHEMA_SQL = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'schema.sql')
+
+_importer = None
+
+def load_importer():
+  """Nacita import.py ako modul (meno suboru nie je platny identifikator)."""
+  global _importer
+  if _importer is None:
+    _importer = imp.load_source('infolist_import', IMPORT_PY)
+  return _importer
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+
+"""
+Spusti benchmarky a vypise vysledky ako JSON.
+
+  python -m bench --infolisty 2000 --subory 4 -o vysledky.json
+  python -m bench --e2e --dsn 'host=localhost user=postgres'
+"""
+
+from __future__ import print_function
+
+import argparse
+import datetime
+import json
+import platform
+import shutil
+import sys
+import tempfile
+
+from bench import load_importer
+from bench import generator
+from bench.runner import run_isolated
+from bench import micro
+
+def main():
+  parser = argparse.ArgumentParser(description='Benchmarky importu infolistov.')
+  parser.add_argument('--infolisty', type=int, default=500, help='pocet infolistov v exporte')
+  parser.add_argument('--subory', type=int, default=1, help='na kolko suborov sa export rozdeli')
+  parser.add_argument('--vyucujuci', type=int, default=3, help='vyucujucich na infolist')
+  parser.add_argument('--pocet-vyucujucich', dest='pocet_vyucujucich', type=int, default=200,
+    help='pocet roznych vyucujucich (osob)')
+  parser.add_argument('--hodnotenia', type=int, default=6, help='pocet znamok v hodnoteniach (max 6)')
+  parser.add_argument('--formula', type=int, default=3, help='pocet kodov v podmienujucich predmetoch')
+  parser.add_argument('--odstavce', type=int, default=10, help='pocet odstavcov v textoch (_SO_, _P_, ...)')
+  parser.add_argument('--seed', type=int, default=0)
+  parser.add_argument('--opakovani', type=int, default=10, help='opakovani mikro-benchmarkov')
+  parser.add_argument('--e2e', action='store_true', help='spusti aj end-to-end benchmark import2db')
+  parser.add_argument('--engine', action='append', choices=['riadky', 'copy'],
+    help='engine pre --e2e (da sa zadat viackrat, predvolene oba)')
+  parser.add_argument('--dsn', help='pouzi existujuci PostgreSQL server namiesto docasneho')
+  parser.add_argument('--pg-bin', dest='pg_bin', help='adresar s initdb a pg_ctl')
+  parser.add_argument('-o', '--output', help='kam zapisat JSON (predvolene stdout)')
+  args = parser.parse_args()
+
+  m = load_importer()
+  parametre = dict((k, getattr(args, k)) for k in ('infolisty', 'subory', 'vyucujuci',
+    'pocet_vyucujucich', 'hodnotenia', 'formula', 'odstavce', 'seed', 'opakovani'))
+  vystup = {
+    'cas': datetime.datetime.now().isoformat(),
+    'python': platform.python_version(),
+    'etree': m.ET.__name__,
+    'parametre': parametre,
+    'vysledky': {},
+  }
+  vysledky = vystup['vysledky']
+
+  adresar = tempfile.mkdtemp(prefix='infolist-bench-xml-')
+  try:
+    filenames = generator.write_export(adresar, subory=args.subory,
+      infolisty=args.infolisty, seed=args.seed, vyucujuci=args.vyucujuci,
+      pocet_vyucujucich=args.pocet_vyucujucich, hodnotenia=args.hodnotenia,
+      formula=args.formula, odstavce=args.odstavce)
+
+    vysledky['parse_formula'] = run_isolated(micro.bench_parse_formula,
+      velkost=max(args.formula, 1), predmetov=args.infolisty, opakovani=args.opakovani,
+      seed=args.seed)
+    vysledky['formula'] = run_isolated(micro.bench_formula,
+      velkost=max(args.formula, 1), predmetov=args.infolisty, opakovani=args.opakovani,
+      seed=args.seed)
+    vysledky['html_to_text'] = run_isolated(micro.bench_html_to_text,
+      odstavce=args.odstavce, opakovani=args.opakovani, seed=args.seed)
+    vysledky['process_file'] = run_isolated(micro.bench_process_file, filenames)
+
+    if args.e2e:
+      from bench import e2e
+      engines = args.engine or ['riadky', 'copy']
+      if args.dsn:
+        server = None
+        dsn = args.dsn
+      else:
+        server = e2e.TmpPostgres(args.pg_bin).__enter__()
+        dsn = server.dsn
+      try:
+        e2e.prepare_template(dsn, pocet_vyucujucich=args.pocet_vyucujucich)
+        for engine in engines:
+          vysledky['import2db_' + engine] = run_isolated(e2e.bench_import2db,
+            dsn, filenames, engine=engine)
+        e2e.drop_template(dsn)
+      finally:
+        if server is not None:
+          server.__exit__(None, None, None)
+  finally:
+    shutil.rmtree(adresar, ignore_errors=True)
+
+  if args.output:
+    with open(args.output, 'w') as f:
+      json.dump(vystup, f, indent=2, sort_keys=True)
+  else:
+    json.dump(vystup, sys.stdout, indent=2, sort_keys=True)
+    print()
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+
+"""
+End-to-end benchmark import2db proti docasnej PostgreSQL databaze.
+
+Databaza sa vytvori zo schemy v bench/schema.sql. Bud sa spusti vlastny
+docasny server (initdb + pg_ctl, nesmie bezat pod rootom), alebo sa pouzije
+existujuci server zadany cez DSN, na ktorom sa vytvoria a zmazu docasne
+databazy.
+"""
+
+from __future__ import print_function
+
+import glob
+import os
+import os.path
+import shutil
+import subprocess
+import tempfile
+from contextlib import closing
+from distutils.spawn import find_executable
+from timeit import default_timer
+
+import psycopg2
+
+from bench import SCHEMA_SQL, load_importer
+from bench import generator
+
+TEMPLATE_DB = 'infolist_bench_template'
+
+def find_pg_bin(pg_bin=None):
+  """Najde adresar s initdb a pg_ctl."""
+  if pg_bin:
+    return pg_bin
+  initdb = find_executable('initdb')
+  if initdb:
+    return os.path.dirname(initdb)
+  kandidati = sorted(glob.glob('/usr/lib/postgresql/*/bin/initdb'))
+  if kandidati:
+    return os.path.dirname(kandidati[-1])
+  raise RuntimeError('Nenasiel som initdb, zadajte adresar cez --pg-bin alebo pouzite --dsn')
+
+class TmpPostgres(object):
+  """Docasny PostgreSQL server v docasnom adresari, pocuva iba na unix sockete."""
+  def __init__(self, pg_bin=None, port=54329):
+    self.pg_bin = find_pg_bin(pg_bin)
+    self.port = port
+    self.dir = None
+
+  def _run(self, prog, *args):
+    with open(os.devnull, 'w') as devnull:
+      subprocess.check_call([os.path.join(self.pg_bin, prog)] + list(args),
+                            stdout=devnull, stderr=subprocess.STDOUT)
+
+  def __enter__(self):
+    if hasattr(os, 'geteuid') and os.geteuid() == 0:
+      raise RuntimeError('initdb nejde spustit pod rootom, pouzite --dsn')
+    self.dir = tempfile.mkdtemp(prefix='infolist-bench-')
+    data = os.path.join(self.dir, 'data')
+    self._run('initdb', '-D', data, '-U', 'postgres', '-A', 'trust', '-E', 'UTF8')
+    self._run('pg_ctl', '-D', data, '-w', '-l', os.path.join(self.dir, 'log'),
+              '-o', "-k {} -p {} -c listen_addresses='' -c fsync=off".format(self.dir, self.port),
+              'start')
+    return self
+
+  def __exit__(self, *exc):
+    try:
+      self._run('pg_ctl', '-D', os.path.join(self.dir, 'data'), '-m', 'fast', '-w', 'stop')
+    finally:
+      shutil.rmtree(self.dir, ignore_errors=True)
+
+  @property
+  def dsn(self):
+    return 'host={} port={} user=postgres dbname=postgres'.format(self.dir, self.port)
+
+def _dsn_with_db(dsn, dbname):
+  return '{} dbname={}'.format(dsn, dbname)
+
+def _admin(dsn, *statements):
+  with closing(psycopg2.connect(dsn)) as con:
+    con.autocommit = True
+    with closing(con.cursor()) as cur:
+      for statement in statements:
+        cur.execute(statement)
+
+def prepare_template(dsn, pocet_vyucujucich=200):
+  """Vytvori sablonovu databazu so schemou, pouzivatelom admin a vyucujucimi."""
+  _admin(dsn, 'DROP DATABASE IF EXISTS {}'.format(TEMPLATE_DB),
+         "CREATE DATABASE {} ENCODING 'UTF8' TEMPLATE template0".format(TEMPLATE_DB))
+  with closing(psycopg2.connect(_dsn_with_db(dsn, TEMPLATE_DB))) as con:
+    with closing(con.cursor()) as cur:
+      with open(SCHEMA_SQL) as f:
+        cur.execute(f.read())
+      cur.execute("INSERT INTO osoba (login, cele_meno) VALUES ('admin', 'Admin')")
+      cur.executemany('INSERT INTO osoba (login, cele_meno) VALUES (%s, %s)',
+        [('u{}'.format(i), generator.meno_vyucujuceho(i)) for i in range(pocet_vyucujucich)])
+      cur.executemany('INSERT INTO literatura_pre_import_predmetov VALUES (%s, %s)',
+        [(generator.skratka_predmetu(i), bib_id) for i in range(0, 1000, 7) for bib_id in (1, 2)])
+    con.commit()
+
+def drop_template(dsn):
+  _admin(dsn, 'DROP DATABASE IF EXISTS {}'.format(TEMPLATE_DB))
+
+def bench_import2db(dsn, filenames, engine='riadky'):
+  """Naimportuje sparsovane subory do novej kopie sablonovej databazy.
+
+  Meria sa iba zapis do DB (import2db), parsovanie prebehne vopred.
+  """
+  m = load_importer()
+  m._warn_sink = []
+  dbname = 'infolist_bench_{}'.format(engine)
+  _admin(dsn, 'DROP DATABASE IF EXISTS {}'.format(dbname),
+         'CREATE DATABASE {} TEMPLATE {}'.format(dbname, TEMPLATE_DB))
+  try:
+    data = [m.process_file(filename) for filename in filenames]
+    with closing(psycopg2.connect(_dsn_with_db(dsn, dbname))) as con:
+      with closing(con.cursor()) as cur:
+        cur.execute("SELECT id FROM osoba WHERE login = 'admin'")
+        user = cur.fetchone()[0]
+      start = default_timer()
+      resolver = m.Resolver(con)
+      for zaznamy in data:
+        m.engines[engine](con, zaznamy, user, resolver=resolver)
+      con.commit()
+      seconds = default_timer() - start
+      with closing(con.cursor()) as cur:
+        cur.execute('SELECT count(*) FROM infolist')
+        records = cur.fetchone()[0]
+  finally:
+    _admin(dsn, 'DROP DATABASE IF EXISTS {}'.format(dbname))
+  return {'records': records, 'seconds': seconds, 'engine': engine}
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+
+"""
+Generator syntetickych AIS exportov v tvare, aky ocakava process_file.
+"""
+
+from __future__ import print_function
+
+import io
+import os
+import os.path
+import random
+from xml.sax.saxutils import escape
+
+SPOSOBY = [u'Prednáška', u'Cvičenie', u'Seminár', u'Laboratórne cvičenie',
+           u'Samostatná práca', u'Prax']
+TYPY_VYUCUJUCICH = ['P', 'C', 'S', 'L']
+HODNOTENIA = ['A', 'B', 'C', 'D', 'E', 'FX']
+SLOVA = (u'matematika informatika algoritmus dôkaz množina graf štruktúra '
+         u'programovanie jazyk model výpočet logika analýza štatistika '
+         u'pravdepodobnosť úloha riešenie metóda systém databáza').split()
+
+def kod_predmetu(i):
+  return u'FMFI.KI/1-INF-%05d/15' % i
+
+def skratka_predmetu(i):
+  return u'1-INF-%05d' % i
+
+def meno_vyucujuceho(i):
+  return u'doc. RNDr. Učiteľ Testovací %d, PhD.' % i
+
+def _veta(r, slov):
+  return u' '.join(r.choice(SLOVA) for _ in range(slov)).capitalize()
+
+def _formula(r, kody, velkost):
+  """Nahodny vyraz v tvare, aky pouziva AIS, napr. 'A alebo (B, C)'."""
+  if velkost <= 1:
+    return r.choice(kody)
+  lavy = r.randint(1, velkost - 1)
+  op = r.choice([u', ', u' alebo '])
+  vyraz = _formula(r, kody, lavy) + op + _formula(r, kody, velkost - lavy)
+  if r.random() < 0.3:
+    vyraz = u'(' + vyraz + u')'
+  return vyraz
+
+def _texty(r, odstavce):
+  out = [u'<texty>']
+  for i in range(odstavce):
+    druh = r.random()
+    if druh < 0.3:
+      text = u'- ' + _veta(r, 6)
+    elif druh < 0.5:
+      text = u'%d. %s' % (i + 1, _veta(r, 6))
+    elif druh < 0.6:
+      text = u'%s <b>%s</b> %s' % (_veta(r, 4), _veta(r, 2), _veta(r, 4))
+    else:
+      text = _veta(r, 15)
+    out.append(u'<p>%s</p>' % text)
+  out.append(u'</texty>')
+  return u''.join(out)
+
+def write_infolisty(w, infolisty=100, prvy=0, predmetov=None, vyucujuci=3,
+                    pocet_vyucujucich=200, hodnotenia=6, formula=3,
+                    odstavce=10, seed=0):
+  """Zapise do textoveho suboru w jeden XML export s infolisty predmetov
+  prvy .. prvy+infolisty-1.
+
+  predmetov je celkovy pocet predmetov, na ktore mozu odkazovat podmienky,
+  formula pocet kodov v podmienujucich predmetoch, odstavce dlzka textov
+  (_SO_, _P_, ...) v odstavcoch.
+  """
+  r = random.Random(seed)
+  if predmetov is None:
+    predmetov = prvy + infolisty
+  kody = [kod_predmetu(i) for i in range(predmetov)]
+  w.write(u'<?xml version="1.0" encoding="UTF-8"?>\n<export>\n'
+          u'<organizacnaJednotka>FMFI</organizacnaJednotka>\n<informacneListy>\n')
+  for i in range(prvy, prvy + infolisty):
+    sposoby = r.sample(SPOSOBY, r.randint(1, 3))
+    w.write(u'<informacnyList>\n')
+    w.write(u'<kod>%s</kod><skratka>%s</skratka><nazov>%s</nazov><kredit>%d</kredit>\n'
+            % (kod_predmetu(i), skratka_predmetu(i), escape(_veta(r, 4)), r.randint(2, 9)))
+    w.write(u'<sposobUkoncenia>skúška</sposobUkoncenia>'
+            u'<sposobVyucby>%s</sposobVyucby>' % u' / '.join(sposoby))
+    w.write(u'<rozsahTyzdenny>%s</rozsahTyzdenny><rozsahSemestranly/>\n'
+            % u' / '.join(str(r.randint(1, 4)) for _ in sposoby))
+    w.write(u'<obdobie>2015/2016</obdobie><rokRocnikStudPlan>1</rokRocnikStudPlan>'
+            u'<kodSemesterStudPlan>%s</kodSemesterStudPlan>'
+            u'<jazyk>slovenský jazyk</jazyk>\n' % r.choice('ZL'))
+    podm = _formula(r, kody, formula) if formula and r.random() < 0.8 else u''
+    vyluc = r.choice(kody) if r.random() < 0.2 else u''
+    w.write(u'<podmienujucePredmety>%s</podmienujucePredmety>'
+            u'<vylucujucePredmety>%s</vylucujucePredmety>\n' % (podm, vyluc))
+    w.write(u'<metodyStudia><metodaStudia>prezenčná</metodaStudia></metodyStudia>\n')
+    w.write(u'<vyucujuciAll>')
+    for j in range(vyucujuci):
+      w.write(u'<vyucujuci><id>%d</id><typ>%s</typ><plneMeno>%s</plneMeno></vyucujuci>'
+              % (j, r.choice(TYPY_VYUCUJUCICH), meno_vyucujuceho(r.randrange(pocet_vyucujucich))))
+    w.write(u'</vyucujuciAll>\n<zabezpecuju>%s</zabezpecuju>\n' % meno_vyucujuceho(0))
+    w.write(u'<datumSchvalenia>%02d.%02d.2015</datumSchvalenia>\n'
+            % (r.randint(1, 28), r.randint(1, 12)))
+    w.write(u'<_VH_><texty><p>%d/%d</p></texty></_VH_>\n' % (40, 60))
+    for e in ('_SO_', '_VV_', '_Z_', '_P_', '_O_', '_S_'):
+      w.write(u'<%s>%s</%s>\n' % (e, _texty(r, odstavce), e))
+    pocty = [r.randint(0, 20) for _ in HODNOTENIA[:hodnotenia]]
+    w.write(u'<hodnoteniaPredmetu><celkovyPocetHodnotenychStudentov>%d'
+            u'</celkovyPocetHodnotenychStudentov>' % sum(pocty))
+    for hodn, pocet in zip(HODNOTENIA, pocty):
+      w.write(u'<hodnoteniePredmetu><kod>%s</kod><pocetHodnoteni>%d</pocetHodnoteni>'
+              u'<percentualneVyjadrenieZCelkPoctuHodnoteni>%.2f'
+              u'</percentualneVyjadrenieZCelkPoctuHodnoteni></hodnoteniePredmetu>'
+              % (hodn, pocet, 100.0 * pocet / max(sum(pocty), 1)))
+    w.write(u'</hodnoteniaPredmetu>\n</informacnyList>\n')
+  w.write(u'</informacneListy>\n</export>\n')
+
+def write_export(directory, subory=1, infolisty=100, seed=0, **kwargs):
+  """Vytvori v adresari export rozdeleny do suborov, vrati zoznam suborov."""
+  if not os.path.isdir(directory):
+    os.makedirs(directory)
+  na_subor = (infolisty + subory - 1) // subory
+  filenames = []
+  for i in range(subory):
+    prvy = i * na_subor
+    pocet = min(na_subor, infolisty - prvy)
+    if pocet <= 0:
+      break
+    filename = os.path.join(directory, 'export%03d.xml' % i)
+    with io.open(filename, 'w', encoding='utf-8') as f:
+      write_infolisty(f, infolisty=pocet, prvy=prvy, predmetov=infolisty,
+                      seed=seed + i, **kwargs)
+    filenames.append(filename)
+  return filenames
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+
+"""
+Mikro-benchmarky parse_formula, formula, html_to_text a process_file.
+
+Kazda funkcia si najprv pripravi vstupy a meria iba samotne volania.
+"""
+
+from __future__ import print_function
+
+import random
+from timeit import default_timer
+
+from bench import load_importer
+from bench import generator
+
+def bench_parse_formula(formul=1000, velkost=3, predmetov=1000, opakovani=10, seed=0):
+  m = load_importer()
+  r = random.Random(seed)
+  kody = [generator.kod_predmetu(i) for i in range(predmetov)]
+  formuly = [generator._formula(r, kody, velkost) for _ in range(formul)]
+  start = default_timer()
+  for _ in range(opakovani):
+    for formula in formuly:
+      m.parse_formula(formula)
+  return {'calls': formul * opakovani, 'seconds': default_timer() - start}
+
+def bench_formula(formul=1000, velkost=3, predmetov=1000, opakovani=10, seed=0):
+  """Ako bench_parse_formula, ale cez formula() s cache."""
+  m = load_importer()
+  r = random.Random(seed)
+  kody = [generator.kod_predmetu(i) for i in range(predmetov)]
+  formuly = [generator._formula(r, kody, velkost) for _ in range(formul)]
+  start = default_timer()
+  for _ in range(opakovani):
+    for formula in formuly:
+      m.formula(formula)
+  zasahy, minutia = m.formula_stats
+  return {'calls': formul * opakovani, 'seconds': default_timer() - start,
+          'hit_rate': float(zasahy) / max(zasahy + minutia, 1)}
+
+def bench_html_to_text(textov=1000, odstavce=10, opakovani=10, seed=0):
+  m = load_importer()
+  r = random.Random(seed)
+  elementy = [m.ET.fromstring(generator._texty(r, odstavce).encode('utf-8'))
+              for _ in range(textov)]
+  znakov = sum(len(m.html_to_text(e)) for e in elementy)
+  start = default_timer()
+  for _ in range(opakovani):
+    for e in elementy:
+      m.html_to_text(e)
+  return {'calls': textov * opakovani, 'seconds': default_timer() - start,
+          'chars_per_call': float(znakov) / max(textov, 1)}
+
+def bench_process_file(filenames):
+  m = load_importer()
+  # diagnostiku zahodime, benchmark nema byt zavisly od terminalu
+  m._warn_sink = []
+  start = default_timer()
+  records = 0
+  for filename in filenames:
+    for d in m.iter_file(filename):
+      records += 1
+  return {'records': records, 'seconds': default_timer() - start}
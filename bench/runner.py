@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+
+"""
+Spustanie jednotlivych benchmarkov v samostatnom procese, aby sa dala
+zmerat ich spicka pamate.
+"""
+
+from __future__ import print_function
+
+import multiprocessing
+import resource
+import sys
+import traceback
+from timeit import default_timer
+
+def _maxrss_kb():
+  maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  if sys.platform == 'darwin': # na macOS su to bajty
+    maxrss //= 1024
+  return maxrss
+
+def run_isolated(fn, *args, **kwargs):
+  """Spusti fn v novom procese a vrati jej vysledok (dict) doplneny o cas
+  a spicku pamate procesu."""
+  queue = multiprocessing.Queue()
+
+  def target():
+    try:
+      start_rss = _maxrss_kb()
+      start = default_timer()
+      vysledok = fn(*args, **kwargs) or {}
+      vysledok.setdefault('seconds', default_timer() - start)
+      vysledok['start_rss_kb'] = start_rss
+      vysledok['peak_rss_kb'] = _maxrss_kb()
+      queue.put((True, vysledok))
+    except Exception:
+      queue.put((False, traceback.format_exc()))
+
+  p = multiprocessing.Process(target=target)
+  p.start()
+  ok, vysledok = queue.get()
+  p.join()
+  if not ok:
+    raise RuntimeError('Benchmark {} zlyhal:\n{}'.format(fn.__name__, vysledok))
+  for kluc, pocet in (('records', 'records_per_sec'), ('calls', 'calls_per_sec')):
+    if kluc in vysledok and vysledok['seconds'] > 0:
+      vysledok[pocet] = vysledok[kluc] / vysledok['seconds']
+  return vysledok
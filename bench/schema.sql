@@ -0,0 +1,109 @@
+-- Minimalna cast schemy databazy editora infolistov, ktoru potrebuje import.py.
+-- Pouziva sa iba v benchmarkoch na docasnom PostgreSQL serveri.
+BEGIN;
+
+CREATE TABLE osoba (
+  id serial primary key,
+  login varchar(50),
+  cele_meno varchar(250) not null
+);
+
+CREATE TABLE predmet (
+  id serial primary key,
+  kod_predmetu varchar(50),
+  skratka varchar(50),
+  povodny_kod varchar(50),
+  povodna_skratka varchar(50)
+);
+
+CREATE TABLE infolist_verzia (
+  id serial primary key,
+  podm_absol_percenta_skuska integer,
+  hodnotenia_a_pocet integer,
+  hodnotenia_b_pocet integer,
+  hodnotenia_c_pocet integer,
+  hodnotenia_d_pocet integer,
+  hodnotenia_e_pocet integer,
+  hodnotenia_fx_pocet integer,
+  modifikovane timestamp not null,
+  modifikoval integer not null references osoba(id),
+  hromadna_zmena boolean not null default false,
+  pocet_kreditov integer,
+  fakulta varchar(50),
+  podmienujuce_predmety text,
+  odporucane_predmety text,
+  vylucujuce_predmety text,
+  potrebny_jazyk varchar(10),
+  treba_zmenit_kod boolean not null default false,
+  predpokladany_semester varchar(1),
+  predchadzajuca_verzia integer references infolist_verzia(id)
+);
+
+CREATE TABLE infolist_verzia_preklad (
+  infolist_verzia integer not null references infolist_verzia(id),
+  jazyk_prekladu varchar(2) not null,
+  nazov_predmetu text,
+  podm_absol_priebezne text,
+  podm_absol_skuska text,
+  vysledky_vzdelavania text,
+  strucna_osnova text,
+  primary key(infolist_verzia, jazyk_prekladu)
+);
+
+CREATE TABLE infolist_verzia_suvisiace_predmety (
+  infolist_verzia integer not null references infolist_verzia(id),
+  predmet integer not null references predmet(id),
+  primary key(infolist_verzia, predmet)
+);
+
+CREATE TABLE infolist_verzia_vyucujuci (
+  infolist_verzia integer not null references infolist_verzia(id),
+  poradie integer not null,
+  osoba integer not null references osoba(id),
+  primary key(infolist_verzia, osoba)
+);
+
+CREATE TABLE infolist_verzia_vyucujuci_typ (
+  infolist_verzia integer not null references infolist_verzia(id),
+  osoba integer not null references osoba(id),
+  typ_vyucujuceho varchar(1) not null,
+  primary key(infolist_verzia, osoba, typ_vyucujuceho)
+);
+
+CREATE TABLE infolist_verzia_cinnosti (
+  infolist_verzia integer not null references infolist_verzia(id),
+  metoda_vyucby varchar(1) not null,
+  druh_cinnosti varchar(1) not null,
+  pocet_hodin integer,
+  za_obdobie varchar(1)
+);
+
+CREATE TABLE infolist_verzia_literatura (
+  infolist_verzia integer not null references infolist_verzia(id),
+  bib_id integer not null,
+  poradie integer not null,
+  primary key(infolist_verzia, bib_id)
+);
+
+CREATE TABLE infolist (
+  id serial primary key,
+  posledna_verzia integer not null references infolist_verzia(id),
+  import_z_aisu boolean not null default false,
+  zamknute timestamp,
+  zamkol integer references osoba(id),
+  povodny_kod_predmetu varchar(50)
+);
+
+CREATE TABLE predmet_infolist (
+  predmet integer not null references predmet(id),
+  infolist integer not null references infolist(id),
+  primary key(predmet, infolist)
+);
+
+CREATE TABLE literatura_pre_import_predmetov (
+  kod_predmetu varchar(50) not null,
+  bib_id integer not null,
+  primary key(kod_predmetu, bib_id)
+);
+
+COMMIT;
@@ -20,9 +20,24 @@ import os.path
 import psycopg2
 from contextlib import closing
 import datetime
+import hashlib
+import io
+import json
+import multiprocessing
+import traceback
+import zlib
+import uuid
+import cPickle as pickle
+import Queue
 from contextlib import contextmanager
+from timeit import default_timer
+from collections import OrderedDict, deque
+import itertools
 
 _context = []
+# ak nie je None, diagnostika sa namiesto vypisu zbiera do tohto zoznamu
+# (napr. v pracovnom procese, hlavny proces ju potom preda cez emit)
+_warn_sink = None
 
 def fmtcontext(d):
   return u' '.join(u'{}={}'.format(k, d[k]) for k in d)
@@ -33,22 +48,315 @@ def context(**kwargs):
   try:
     yield
   except:
-    sys.stderr.write(fmtcontext(_context[-1]))
-    sys.stderr.write('\n')
+    # kde nastala vynimka; text None znamena, ze sa vypise iba kontext
+    emit(('chyba', 'vynimka', None, (_context[-1],)))
     raise
   finally:
     _context.pop()
 
-def warn(text):
-  sys.stderr.write(u' '.join(fmtcontext(x) for x in _context).encode('UTF-8'))
-  sys.stderr.write(': ')
-  sys.stderr.write(text.encode('UTF-8'))
-  sys.stderr.write('\n')
+UROVNE = ('debug', 'info', 'varovanie', 'chyba')
+
+class Diagnostika(object):
+  """Vypis diagnostiky importu.
+
+  Zaznam diagnostiky je (uroven, druh, text, kontext), kde kontext je
+  n-tica slovnikov z context(). Vypisuju sa iba zaznamy s urovnou aspon
+  uroven, a to v davkach (najviac po velkost_davky zaznamov alebo raz za
+  sekundu), bud ako text, alebo ako JSON po riadkoch. Pocty zaznamov
+  podla urovne a druhu sa pocitaju vzdy.
+  """
+  def __init__(self, f=None, uroven='info', jsonl=False, velkost_davky=1000):
+    self.f = f
+    self.uroven = UROVNE.index(uroven)
+    self.jsonl = jsonl
+    self.velkost_davky = velkost_davky
+    self.pocty = {} # (uroven, druh) -> pocet
+    self._davka = []
+    self._posledny_zapis = default_timer()
+
+  def zapis(self, zaznam):
+    uroven, druh = zaznam[0], zaznam[1]
+    self.pocty[uroven, druh] = self.pocty.get((uroven, druh), 0) + 1
+    if UROVNE.index(uroven) < self.uroven:
+      return
+    self._davka.append(zaznam)
+    if (len(self._davka) >= self.velkost_davky or
+        default_timer() - self._posledny_zapis > 1.0):
+      self.flush()
+
+  def formatuj(self, zaznam):
+    uroven, druh, text, kontext = zaznam
+    if self.jsonl:
+      x = {'uroven': uroven, 'druh': druh, 'text': text}
+      for k in kontext:
+        x.update(k)
+      return json.dumps(x, sort_keys=True, ensure_ascii=False)
+    riadok = u' '.join(fmtcontext(k) for k in kontext)
+    if text is not None:
+      riadok += u': ' + text
+    return riadok
+
+  def flush(self):
+    self._posledny_zapis = default_timer()
+    if not self._davka:
+      return
+    f = self.f if self.f is not None else sys.stderr
+    f.write(u''.join(self.formatuj(z) + u'\n' for z in self._davka).encode('UTF-8'))
+    f.flush()
+    del self._davka[:]
+
+  def suhrn(self):
+    """Pocty zaznamov podla druhu, od najzavaznejsich."""
+    return sorted(((uroven, druh, pocet) for (uroven, druh), pocet in self.pocty.items()),
+                  key=lambda x: (-UROVNE.index(x[0]), -x[2], x[1]))
+
+  def vypis_suhrn(self, f):
+    self.flush()
+    suhrn = [x for x in self.suhrn() if x[0] != 'debug']
+    if suhrn:
+      f.write('Diagnostika:\n')
+      for uroven, druh, pocet in suhrn:
+        f.write('{:>8}  {:<10} {}\n'.format(pocet, uroven, druh))
+
+_diagnostika = Diagnostika()
+
+def emit(zaznam):
+  if _warn_sink is not None:
+    _warn_sink.append(zaznam)
+  else:
+    _diagnostika.zapis(zaznam)
+
+def warn(text, druh='warn', uroven='varovanie'):
+  emit((uroven, druh, text, tuple(_context)))
+  if _problemy is not None and uroven in ('varovanie', 'chyba'):
+    problem(druh, text, uroven=uroven)
+
+def info(text, druh):
+  """Priebezna informacia (napr. o kazdom importovanom infoliste)."""
+  warn(text, druh, uroven='info')
+
+# ak nie je None, --validate-only sem zbiera problemy namiesto vynimiek
+_problemy = None
+
+def problem(druh, text, uroven='chyba'):
+  _problemy.append({'subor': _z_kontextu('subor'), 'riadok': _z_kontextu('line'),
+    'predmet': _z_kontextu('predmet'), 'druh': druh, 'uroven': uroven, 'text': text})
+
+class _Kontrola(object):
+  __slots__ = ('druh',)
+
+  def __init__(self, druh):
+    self.druh = druh
+
+  def __enter__(self):
+    pass
+
+  def __exit__(self, typ, e, tb):
+    if typ is None or not issubclass(typ, Exception):
+      return False
+    if typ is KeyError:
+      problem(self.druh, u'Neznama hodnota {}'.format(e.args[0]))
+    else:
+      problem(self.druh, _popis_chyby(e))
+    return True
+
+def kontrola(druh):
+  """Pri --validate-only zachyti chybu v bloku ako problem druhu druh
+  a pokracuje dalej, inak chybu necha prejst."""
+  if _problemy is None:
+    return _nic
+  return _Kontrola(druh)
+
+def _z_kontextu(kluc):
+  """Hodnota kluca z najvnutornejsieho kontextu, ktory ho obsahuje."""
+  for x in reversed(_context):
+    if kluc in x:
+      return x[kluc]
+  return None
+
+# ak nie je None, --profile meria casy faz a dotazov do tohto objektu
+_profil = None
+
+class _Faza(object):
+  __slots__ = ('profil', 'nazov', 'kod', 'dotaz', 'start')
+
+  def __init__(self, profil, nazov, kod=None, dotaz=None):
+    self.profil = profil
+    self.nazov = nazov
+    self.kod = kod
+    self.dotaz = dotaz
+
+  def __enter__(self):
+    self.profil._vnorene.append(0.0)
+    self.start = default_timer()
+
+  def __exit__(self, *exc):
+    cas = default_timer() - self.start
+    self.profil._zaznamenaj(self, cas, self.profil._vnorene.pop())
+
+class _Nic(object):
+  """Context manager, ktory nic nerobi."""
+  def __enter__(self):
+    pass
+  def __exit__(self, *exc):
+    pass
+
+_nic = _Nic()
+
+class Profil(object):
+  """Casy jednotlivych faz importu a SQL dotazov pre --profile.
+
+  Fazy sa mozu vnarat, kazdej sa pocita iba vlastny cas (bez vnorenych faz),
+  takze sucet faz zodpoveda celkovemu casu. Cas sa priradi suboru
+  a predmetu podla aktualneho context().
+  """
+  def __init__(self):
+    self.start = default_timer()
+    self.fazy = {}    # faza -> [pocet, cas]
+    self.subory = {}  # subor -> {faza: cas}
+    self.dotazy = {}  # sablona dotazu -> [pocet, cas]
+    self.zaznamy = {} # kod predmetu -> cas parsovania a zapisu do DB
+    self.formuly = [0, 0] # zasahy a minutia cache formul z inych procesov
+    self._formuly_start = list(formula_stats)
+    self._vnorene = []
+
+  def faza(self, nazov, kod=None, dotaz=None):
+    return _Faza(self, nazov, kod, dotaz)
+
+  def _zaznamenaj(self, faza, cas, vnorene):
+    if self._vnorene:
+      self._vnorene[-1] += cas
+    vlastny = cas - vnorene
+    f = self.fazy.setdefault(faza.nazov, [0, 0.0])
+    f[0] += 1
+    f[1] += vlastny
+    subor = _z_kontextu('subor')
+    if subor is not None:
+      s = self.subory.setdefault(subor, {})
+      s[faza.nazov] = s.get(faza.nazov, 0.0) + vlastny
+    if faza.dotaz is not None:
+      q = self.dotazy.setdefault(faza.dotaz, [0, 0.0])
+      q[0] += 1
+      q[1] += cas
+    if faza.kod is not None:
+      self.zaznamy[faza.kod] = self.zaznamy.get(faza.kod, 0.0) + cas
+
+  def data(self):
+    return {'fazy': self.fazy, 'subory': self.subory, 'dotazy': self.dotazy,
+            'zaznamy': self.zaznamy, 'formuly': self._formuly()}
+
+  def _formuly(self):
+    return [self.formuly[i] + formula_stats[i] - self._formuly_start[i] for i in (0, 1)]
+
+  def zluc(self, data):
+    """Pripocita namerane hodnoty z ineho procesu (vysledok data())."""
+    for nazov, (pocet, cas) in data['fazy'].items():
+      f = self.fazy.setdefault(nazov, [0, 0.0])
+      f[0] += pocet
+      f[1] += cas
+    for subor, fazy in data['subory'].items():
+      s = self.subory.setdefault(subor, {})
+      for nazov, cas in fazy.items():
+        s[nazov] = s.get(nazov, 0.0) + cas
+    for dotaz, (pocet, cas) in data['dotazy'].items():
+      q = self.dotazy.setdefault(dotaz, [0, 0.0])
+      q[0] += pocet
+      q[1] += cas
+    for kod, cas in data['zaznamy'].items():
+      self.zaznamy[kod] = self.zaznamy.get(kod, 0.0) + cas
+    for i in (0, 1):
+      self.formuly[i] += data['formuly'][i]
+
+  def suhrn(self, najpomalsich=10):
+    casy = sorted(self.zaznamy.values())
+    zasahy, minutia = self._formuly()
+    def percentil(p):
+      if not casy:
+        return None
+      return casy[min(len(casy) - 1, int(p * len(casy)))]
+    return {
+      'celkovy_cas': default_timer() - self.start,
+      'fazy': dict((nazov, {'pocet': pocet, 'cas': cas})
+                   for nazov, (pocet, cas) in self.fazy.items()),
+      'subory': self.subory,
+      'dotazy': [{'dotaz': dotaz, 'pocet': pocet, 'cas': cas}
+                 for dotaz, (pocet, cas) in sorted(self.dotazy.items(),
+                   key=lambda x: -x[1][1])],
+      'zaznamy': {'pocet': len(casy), 'p50': percentil(0.5),
+                  'p95': percentil(0.95), 'max': casy[-1] if casy else None},
+      'najpomalsie': [{'predmet': kod, 'cas': cas}
+                      for kod, cas in sorted(self.zaznamy.items(),
+                        key=lambda x: -x[1])[:najpomalsich]],
+      'formuly': {'zasahy': zasahy, 'minutia': minutia,
+                  'uspesnost': float(zasahy) / (zasahy + minutia) if zasahy + minutia else None},
+    }
+
+  def vypis(self, f):
+    """Vypise suhrn ako tabulky (pre terminal)."""
+    s = self.suhrn()
+    f.write('Celkovy cas: {:.3f} s\n\n'.format(s['celkovy_cas']))
+    f.write('{:<18} {:>8} {:>12}\n'.format('Faza', 'pocet', 'cas [s]'))
+    for nazov, faza in sorted(s['fazy'].items(), key=lambda x: -x[1]['cas']):
+      f.write('{:<18} {:>8} {:>12.3f}\n'.format(nazov, faza['pocet'], faza['cas']))
+    f.write('\n{:<50} {:>12} {:>12}\n'.format('Dotaz', 'pocet', 'cas [s]'))
+    for q in s['dotazy']:
+      f.write(u'{:<50.50} {:>12} {:>12.3f}\n'.format(q['dotaz'], q['pocet'],
+        q['cas']).encode('UTF-8'))
+    z = s['zaznamy']
+    if z['pocet']:
+      f.write('\nInfolistov: {}, p50 {:.2f} ms, p95 {:.2f} ms, max {:.2f} ms\n'.format(
+        z['pocet'], z['p50'] * 1000, z['p95'] * 1000, z['max'] * 1000))
+      f.write('Najpomalsie predmety:\n')
+      for x in s['najpomalsie']:
+        f.write(u'  {:<40} {:>10.2f} ms\n'.format(x['predmet'], x['cas'] * 1000).encode('UTF-8'))
+    fo = s['formuly']
+    if fo['uspesnost'] is not None:
+      f.write('\nCache formul: {} zasahov, {} minuti ({:.1%})\n'.format(
+        fo['zasahy'], fo['minutia'], fo['uspesnost']))
+
+def faza(nazov, kod=None):
+  """Context manager merajuci cas fazy; bez --profile nerobi nic."""
+  if _profil is None:
+    return _nic
+  return _profil.faza(nazov, kod)
+
+def _meraj_iter(it, nazov):
+  """Iterator, pri ktorom sa cas kazdeho next() zapocita do fazy."""
+  it = iter(it)
+  while True:
+    with _profil.faza(nazov):
+      try:
+        x = next(it)
+      except StopIteration:
+        return
+    yield x
+
+_re_whitespace = re.compile(r'\s+')
+
+class ProfilovanyKurzor(psycopg2.extensions.cursor):
+  """Kurzor, ktory pri --profile meria pocet a cas dotazov podla sablony."""
+  def _faza(self, query):
+    if _profil is None:
+      return _nic
+    if not isinstance(query, basestring):
+      query = str(query)
+    return _profil.faza('sql', dotaz=_re_whitespace.sub(' ', query).strip()[:200])
+
+  def execute(self, query, vars=None):
+    with self._faza(query):
+      return super(ProfilovanyKurzor, self).execute(query, vars)
+
+  def executemany(self, query, vars_list):
+    with self._faza(query):
+      return super(ProfilovanyKurzor, self).executemany(query, vars_list)
+
+  def copy_expert(self, sql, file, size=8192):
+    with self._faza(sql):
+      return super(ProfilovanyKurzor, self).copy_expert(sql, file, size)
 
 def kod2skratka(kod):
-  print(kod)
   skratka = re.match(r'^[^/]+/([^/]+)/', kod).group(1)
-  print(kod,'=>',skratka)
+  warn(u'{} => {}'.format(kod, skratka), 'kod2skratka', uroven='debug')
   return skratka
   #return re.match(r'^[^/]+/(.+)/[^/]+$', kod).group(1)
 
@@ -87,405 +395,1995 @@ def parse_formula(s):
     raise ValueError('Zle uzatvorkovany vyraz')
   return tokens2
 
+# tokeny formuly, ktore nie su kody predmetov
+formula_operators = frozenset(('(', ')', 'AND', 'OR', 'a', 'alebo'))
+
+class Formula(object):
+  """Sparsovana formula podmienujucich alebo vylucujucich predmetov.
+
+  Nemenny objekt, rovnaky text formuly ma (vdaka cache vo formula()) jednu
+  instanciu zdielanu vsetkymi infolistami. kody su odkazovane predmety
+  v poradi prveho vyskytu.
+  """
+  __slots__ = ('text', 'tokeny', 'kody')
+
+  def __init__(self, text):
+    self.text = text
+    self.tokeny = tuple(parse_formula(text)) if text else ()
+    kody = []
+    for token in self.tokeny:
+      if token not in formula_operators and token not in kody:
+        kody.append(token)
+    self.kody = tuple(kody)
+
+  def s_idckami(self, najdi_predmet):
+    """Vrati dvojicu (text formuly s idckami predmetov namiesto kodov,
+    mnozina idciek odkazovanych predmetov)."""
+    idcka = dict((kod, najdi_predmet(kod)) for kod in self.kody)
+    return (u' '.join(str(idcka[t]) if t in idcka else t for t in self.tokeny),
+            set(idcka.values()))
+
+  def __reduce__(self):
+    # po prenose do ineho procesu (alebo z cache) sa formula znova zinternuje
+    return (formula, (self.text,))
+
+  def __repr__(self):
+    return 'Formula({!r})'.format(self.text)
+
+FORMULA_CACHE_SIZE = 4096
+_formuly = OrderedDict()
+# [zasahy, minutia] cache formul
+formula_stats = [0, 0]
+
+def formula(text):
+  """Formula pre dany text; posledne pouzite formuly sa pamataju (LRU)."""
+  text = text or u''
+  f = _formuly.pop(text, None)
+  if f is not None:
+    formula_stats[0] += 1
+  else:
+    formula_stats[1] += 1
+    f = Formula(text)
+    if len(_formuly) >= FORMULA_CACHE_SIZE:
+      _formuly.popitem(last=False)
+  _formuly[text] = f
+  return f
+
+_re_ol = re.compile(r'^\d+\.')
+
+def _flatten_inline(e):
+  """Text odstavca vratane vnorenych inline tagov (<b>, <i>, ...).
+
+  Strom prechadza iterativne, text sa sklada do zoznamu a spaja sa raz.
+  """
+  parts = []
+  if e.text:
+    parts.append(e.text)
+  # na zasobniku su elementy a texty (tail), ktore este treba spracovat
+  stack = list(reversed(e))
+  while stack:
+    x = stack.pop()
+    if isinstance(x, basestring):
+      parts.append(x)
+      continue
+    if x.tail:
+      stack.append(x.tail)
+    if isinstance(x.tag, basestring): # komentare a pod. preskakujeme
+      if x.text:
+        parts.append(x.text)
+      stack.extend(reversed(x))
+  if e.tail:
+    parts.append(e.tail)
+  return u''.join(parts).strip()
+
 def html_to_text(e):
-  def flatten_inline(e):
-    x = u''
-    if e.text:
-      x += e.text
-    for child in e:
-      x += flatten(child)
-    if e.tail:
-      x += e.tail
-    return x.strip()
-  
-  ret = u''
+  ret = []
   lastmode = None
   for child in e:
     if child.tag == 'p':
-      inline = flatten_inline(child)
+      inline = _flatten_inline(child)
       if inline.startswith('-'):
         mode = 'ul'
-      elif re.match(r'^\d+\.', inline):
+      elif _re_ol.match(inline):
         mode = 'ol'
       else:
         mode = 'p'
       if mode == 'ul' and lastmode == 'ul':
-        ret += u'\n'
+        ret.append(u'\n')
       elif mode == 'ol' and lastmode == 'ol':
-        ret += u'\n'
+        ret.append(u'\n')
       else:
-        ret += u'\n\n'
-      ret += inline
+        ret.append(u'\n\n')
+      ret.append(inline)
       lastmode = mode
     else:
       raise ValueError('Unsupported tag')
-  return ret.strip()
+  return u''.join(ret).strip()
 
-def process_file(filename, lang='sk'):
-    xmldoc = ET.parse(filename)
-    root = xmldoc.getroot()
-    organizacnaJednotka = root.find('organizacnaJednotka').text
-    ilisty = root.find('informacneListy')
-    
-    # elementy, ktore sa budu parsovat z XML-ka
-    elements = ('kod', 'skratka', 'nazov', 'kredit', 'sposobUkoncenia', 'sposobVyucby',
-                'rozsahTyzdenny', 'rozsahSemestranly', 'obdobie', 'rokRocnikStudPlan',
-                'kodSemesterStudPlan', 'jazyk', 'podmienujucePredmety', 'metodyStudia',
-                'vyucujuciAll', 'zabezpecuju', 'datumSchvalenia', '_VH_', '_SO_', '_VV_',
-                '_Z_', '_P_', '_O_', '_S_', 'vylucujucePredmety',
-                'hodnoteniaPredmetu')
-
-    map_metodyStudia = {u'prezenčná': 'P', u'dištančná': 'D', u'kombinovaná': 'K'}
-    # vid ciselnik druh_cinnosti
-    map_sposobVyucby = {u'Prednáška': 'P', u'Cvičenie': 'C', u'Samostatná práca': 'D',
-      u'Kurz': 'K', u'Iná': 'I', u'Práce v teréne': 'T', u'Seminár': 'S',
-      u'Laboratórne cvičenie': 'L', u'Prax': 'X', u'sústredenie': 'U',
-      u'Exkurzia': 'E', u'Prednáška+Seminár': 'R',
-      u'prednáška': 'P', u'cvičenie': 'C', u'samostatná práca': 'D',
-      u'kurz': 'K', u'iná': 'I', u'práce v teréne': 'T', u'seminár': 'S',
-      u'laboratórne cvičenie': 'L', u'prax': 'X', 
-      u'exkurzia': 'E', u'prednáška+seminár': 'R'}
-
-    data = []
-
-    # spracovanie informacnych listov jednotlivych predmetov
-    for il in ilisty.findall('informacnyList'):
-      with context(line=getattr(il, 'sourceline', None)):
-        d = {'lang' : lang, 'organizacnaJednotka': organizacnaJednotka}
-        for e in elements:
-            if il.find(e) is not None:
-                if e.startswith('_'):
-                    if e == '_VH_':
-                        d[e] = il.find(e).findtext('texty/p')
-                    else:
-                        d[e] = html_to_text(il.find(e).find('texty'))
-                elif e == 'vyucujuciAll':
-                    d[e] = []
-                    for vyucujuci in il.find(e).findall('vyucujuci'):
-                        d[e].append({
-                            #id = vyucujuci.find('id').text
-                            'typ': vyucujuci.find('typ').text,
-                            'plneMeno': vyucujuci.find('plneMeno').text
-                        })
-                elif e == 'hodnoteniaPredmetu':
-                    d['celkovyPocetHodnotenychStudentov'] = il.find(e).find('celkovyPocetHodnotenychStudentov').text
-                    celk = il.find(e).find('celkovyPocetVsetkychHodnoteni')
-                    if celk is not None:
-                      d['celkovyPocetVsetkychHodnoteni'] = celk.text
-                    else:
-                      d['celkovyPocetVsetkychHodnoteni'] = d['celkovyPocetHodnotenychStudentov']
-                    d['hodnoteniaPredmetu'] = {}
-                    s = 0
-                    for hodnotenie in il.find(e).findall('hodnoteniePredmetu'):
-                        d['hodnoteniaPredmetu'][hodnotenie.find('kod').text] =\
-                        {
-                            'pocetHodnoteni': hodnotenie.find('pocetHodnoteni').text,
-                            'percentualneVyjadrenieZCelkPoctuHodnoteni': hodnotenie.find('percentualneVyjadrenieZCelkPoctuHodnoteni').text
-                        }
-                        s += int(hodnotenie.find('pocetHodnoteni').text)
-                    assert(s == int(d['celkovyPocetVsetkychHodnoteni']))
-                elif e == 'metodyStudia':
-                    metodyStudia = il.find(e).findall('metodaStudia')
-                    assert len(metodyStudia) > 0
-                    if len(metodyStudia) != 1:
-                        warn(u'Predmet %s ma viac metod studia, importujem iba prvu' % d['kod'])
-                    d['metodaStudia'] = map_metodyStudia[metodyStudia[0].text]
-                else:
-                    d[e] = il.find(e).text
-            else:
-                d[e] = None
-        
-        with context(predmet=d['kod']):
-            # vaha hodnotenia
-            if not d['_VH_']:
-                d['vahaSkusky'] = None
-            elif not re.match('^\s*\d+\s*/\s*\d+\s*$', d['_VH_']):
-                d['vahaSkusky'] = None
-                warn(u'Nepodarilo sa sparsovat vahu skusky %s pre predmet %s' % (d['_VH_'], d['kod']))
-            else:
-                vahy = d['_VH_'].split('/')
-                if len(vahy) != 2:
-                  raise AssertionError(u'{} {}'.format(d['kod'], vahy))
-                d['vahaSkusky'] = vahy[1]
-
-            # parsovanie sposobu vyucby
-            d['sposoby'] = []
-            if not d['sposobVyucby']:
-                warn(u'Nenasiel som sposob vyucby pre predmet %s.' % d['kod'])
-            else:
-                sposobVyucby = d['sposobVyucby'].split(' / ')
-                if not d['rozsahTyzdenny']:
-                  rozsahTyzdenny = None
-                else:
-                  rozsahTyzdenny = d['rozsahTyzdenny'].split(' / ')
-                if not d['rozsahSemestranly']:
-                  rozsahSemestranly = None
-                else:
-                  rozsahSemestranly = d['rozsahSemestranly'].split(' / ')
-                if rozsahTyzdenny == None and rozsahSemestranly == None:
-                  warn(u'Nenasiel som rozsah pre predmet %s' % d['kod'])
-                else:
-                  if rozsahTyzdenny == None:
-                    rozsahTyzdenny = [None] * len(sposobVyucby)
-                  if rozsahSemestranly == None:
-                    rozsahSemestranly = [None] * len(sposobVyucby)
-                  for i in range(len(sposobVyucby)):
-                      if (i < len(rozsahTyzdenny)) and (rozsahTyzdenny[i] != None):
-                        hodin = rozsahTyzdenny[i]
-                        za_obdobie = 'T'
-                      elif (i < len(rozsahSemestranly)):
-                        hodin = rozsahSemestranly[i]
-                        za_obdobie = 'S'
-                      else:
-                        hodin = 0
-                        za_obdobie = 'T'
-                      if re.match('^\d+[st]$', hodin):
-                        warn(u'Pocet hodin %s je so suffixom, konvertujem' % hodin)
-                        za_obdobie = hodin[-1].upper()
-                        hodin = int(hodin[:-1])
-                      elif not re.match('^\d+$', hodin):
-                        warn(u'Pocet hodin "%s" nie je cislo, nahradzujem nulou' % hodin)
-                        hodin = 0
-                      else:
-                        hodin = int(hodin)
-                      x = {
-                              'sposobVyucby': map_sposobVyucby[sposobVyucby[i]],
-                              'rozsahHodin': hodin,
-                              'rozsahZaObdobie': za_obdobie
-                          }
-                      d['sposoby'].append(x)
-            
-            if d['podmienujucePredmety']:
-              d['podmienujucePredmety'] = parse_formula(d['podmienujucePredmety'])
-            else:
-              d['podmienujucePredmety'] = []
-            
-            if d['vylucujucePredmety']:
-              d['vylucujucePredmety'] = parse_formula(d['vylucujucePredmety'])
-            else:
-              d['vylucujucePredmety'] = []
+# elementy, ktore sa budu parsovat z XML-ka
+elements = ('kod', 'skratka', 'nazov', 'kredit', 'sposobUkoncenia', 'sposobVyucby',
+            'rozsahTyzdenny', 'rozsahSemestranly', 'obdobie', 'rokRocnikStudPlan',
+            'kodSemesterStudPlan', 'jazyk', 'podmienujucePredmety', 'metodyStudia',
+            'vyucujuciAll', 'zabezpecuju', 'datumSchvalenia', '_VH_', '_SO_', '_VV_',
+            '_Z_', '_P_', '_O_', '_S_', 'vylucujucePredmety',
+            'hodnoteniaPredmetu')
+
+map_metodyStudia = {u'prezenčná': 'P', u'dištančná': 'D', u'kombinovaná': 'K'}
+# vid ciselnik druh_cinnosti
+map_sposobVyucby = {u'Prednáška': 'P', u'Cvičenie': 'C', u'Samostatná práca': 'D',
+  u'Kurz': 'K', u'Iná': 'I', u'Práce v teréne': 'T', u'Seminár': 'S',
+  u'Laboratórne cvičenie': 'L', u'Prax': 'X', u'sústredenie': 'U',
+  u'Exkurzia': 'E', u'Prednáška+Seminár': 'R',
+  u'prednáška': 'P', u'cvičenie': 'C', u'samostatná práca': 'D',
+  u'kurz': 'K', u'iná': 'I', u'práce v teréne': 'T', u'seminár': 'S',
+  u'laboratórne cvičenie': 'L', u'prax': 'X', 
+  u'exkurzia': 'E', u'prednáška+seminár': 'R'}
+
+# elementy, ktore sa do DB nezapisuju; parsuju sa iba ak si ich vyziadame
+unused_elements = ('sposobUkoncenia', 'obdobie', 'rokRocnikStudPlan', 'jazyk',
+                   'zabezpecuju', '_O_', '_S_')
+
+# kratke hodnoty, ktore sa v exporte casto opakuju; internuju sa
+interned_elements = frozenset(('kredit', 'sposobUkoncenia', 'sposobVyucby',
+    'rozsahTyzdenny', 'rozsahSemestranly', 'obdobie', 'rokRocnikStudPlan',
+    'kodSemesterStudPlan', 'jazyk', 'zabezpecuju', 'datumSchvalenia'))
+
+_interned = {}
+
+def intern_text(text):
+  """Vrati jedinu zdielanu instanciu retazca (funguje aj pre unicode,
+  na rozdiel od vstavaneho intern)."""
+  return _interned.setdefault(text, text)
+
+class _Zaznam(object):
+  """Zaklad sparsovanych zaznamov so __slots__.
+
+  Chybajuce polia su None. Pri pickle sa uklada iba n-tica hodnot a polia
+  z _intern sa po nacitani znova zinternuju.
+  """
+  __slots__ = ()
+  _intern = ()
+
+  def __init__(self, **kwargs):
+    for pole in self.__slots__:
+      setattr(self, pole, kwargs.pop(pole, None))
+    if kwargs:
+      raise TypeError('Nezname polia {}'.format(', '.join(sorted(kwargs))))
+
+  def __getstate__(self):
+    return tuple(getattr(self, pole) for pole in self.__slots__)
+
+  def __setstate__(self, stav):
+    for pole, hodnota in zip(self.__slots__, stav):
+      if pole in self._intern:
+        hodnota = intern_text(hodnota)
+      setattr(self, pole, hodnota)
+
+  def __repr__(self):
+    return '{}({})'.format(type(self).__name__, ', '.join(
+      '{}={!r}'.format(pole, getattr(self, pole)) for pole in self.__slots__))
+
+class Vyucujuci(_Zaznam):
+  __slots__ = ('typ', 'plneMeno')
+  _intern = __slots__
+
+class Hodnotenie(_Zaznam):
+  __slots__ = ('pocetHodnoteni', 'percentualneVyjadrenieZCelkPoctuHodnoteni')
+  _intern = __slots__
+
+class Sposob(_Zaznam):
+  __slots__ = ('sposobVyucby', 'rozsahHodin', 'rozsahZaObdobie')
+
+class Infolist(_Zaznam):
+  """Sparsovany infolist; polia elements a odvodene hodnoty."""
+  __slots__ = elements + ('lang', 'organizacnaJednotka', 'hash', 'metodaStudia',
+    'vahaSkusky', 'sposoby', 'celkovyPocetHodnotenychStudentov',
+    'celkovyPocetVsetkychHodnoteni', 'preklady')
+  _intern = interned_elements | frozenset(('lang', 'organizacnaJednotka'))
+
+class Preklad(_Zaznam):
+  """Texty infolistu z exportu v dalsom jazyku (vid nacitaj_preklady)."""
+  __slots__ = ('lang', 'nazov', '_P_', '_Z_', '_VV_', '_SO_')
+  _intern = ('lang',)
+
+def _parse_text(d, e):
+    text = e.text
+    if e.tag in interned_elements:
+        text = intern_text(text)
+    setattr(d, e.tag, text)
+
+def _parse_VH(d, e):
+    d._VH_ = e.findtext('texty/p')
+
+def _parse_html(d, e):
+    with faza('html_to_text'):
+        setattr(d, e.tag, html_to_text(e.find('texty')))
+
+def _parse_vyucujuciAll(d, e):
+    d.vyucujuciAll = []
+    for vyucujuci in e.iterfind('vyucujuci'):
+        d.vyucujuciAll.append(Vyucujuci(
+            #id = vyucujuci.find('id').text
+            typ=intern_text(vyucujuci.findtext('typ')),
+            plneMeno=intern_text(vyucujuci.findtext('plneMeno'))
+        ))
+
+def _parse_hodnoteniaPredmetu(d, e):
+    d.celkovyPocetHodnotenychStudentov = e.find('celkovyPocetHodnotenychStudentov').text
+    celk = e.find('celkovyPocetVsetkychHodnoteni')
+    if celk is not None:
+      d.celkovyPocetVsetkychHodnoteni = celk.text
+    else:
+      d.celkovyPocetVsetkychHodnoteni = d.celkovyPocetHodnotenychStudentov
+    d.hodnoteniaPredmetu = {}
+    s = 0
+    for hodnotenie in e.iterfind('hodnoteniePredmetu'):
+        pocetHodnoteni = intern_text(hodnotenie.find('pocetHodnoteni').text)
+        d.hodnoteniaPredmetu[intern_text(hodnotenie.find('kod').text)] = Hodnotenie(
+            pocetHodnoteni=pocetHodnoteni,
+            percentualneVyjadrenieZCelkPoctuHodnoteni=intern_text(
+              hodnotenie.find('percentualneVyjadrenieZCelkPoctuHodnoteni').text)
+        )
+        s += int(pocetHodnoteni)
+    assert s == int(d.celkovyPocetVsetkychHodnoteni), \
+        u'Sucet hodnoteni {} nesedi s celkovym poctom {}'.format(s, d.celkovyPocetVsetkychHodnoteni)
+
+def _parse_metodyStudia(d, e):
+    metodyStudia = e.findall('metodaStudia')
+    assert len(metodyStudia) > 0, u'Chyba metoda studia'
+    if len(metodyStudia) != 1:
+        warn(u'Predmet %s ma viac metod studia, importujem iba prvu' % d.kod, 'metodaStudia')
+    d.metodaStudia = map_metodyStudia[metodyStudia[0].text]
+
+# ako sa parsuje ktory element
+element_handlers = dict((e, _parse_text) for e in elements)
+element_handlers.update(dict((e, _parse_html) for e in elements if e.startswith('_')))
+element_handlers.update({
+  '_VH_': _parse_VH,
+  'vyucujuciAll': _parse_vyucujuciAll,
+  'hodnoteniaPredmetu': _parse_hodnoteniaPredmetu,
+  'metodyStudia': _parse_metodyStudia,
+})
+db_element_handlers = dict((e, h) for e, h in element_handlers.items()
+                           if e not in unused_elements)
+
+def _parse_sposoby(d):
+    d.sposoby = []
+    if not d.sposobVyucby:
+        warn(u'Nenasiel som sposob vyucby pre predmet %s.' % d.kod, 'sposobVyucby')
+    else:
+        sposobVyucby = d.sposobVyucby.split(' / ')
+        if not d.rozsahTyzdenny:
+          rozsahTyzdenny = None
+        else:
+          rozsahTyzdenny = d.rozsahTyzdenny.split(' / ')
+        if not d.rozsahSemestranly:
+          rozsahSemestranly = None
+        else:
+          rozsahSemestranly = d.rozsahSemestranly.split(' / ')
+        if rozsahTyzdenny == None and rozsahSemestranly == None:
+          warn(u'Nenasiel som rozsah pre predmet %s' % d.kod, 'rozsah')
+        else:
+          if rozsahTyzdenny == None:
+            rozsahTyzdenny = [None] * len(sposobVyucby)
+          if rozsahSemestranly == None:
+            rozsahSemestranly = [None] * len(sposobVyucby)
+          for i in range(len(sposobVyucby)):
+              if (i < len(rozsahTyzdenny)) and (rozsahTyzdenny[i] != None):
+                hodin = rozsahTyzdenny[i]
+                za_obdobie = 'T'
+              elif (i < len(rozsahSemestranly)):
+                hodin = rozsahSemestranly[i]
+                za_obdobie = 'S'
+              else:
+                hodin = 0
+                za_obdobie = 'T'
+              if re.match('^\d+[st]$', hodin):
+                warn(u'Pocet hodin %s je so suffixom, konvertujem' % hodin, 'rozsah')
+                za_obdobie = hodin[-1].upper()
+                hodin = int(hodin[:-1])
+              elif not re.match('^\d+$', hodin):
+                warn(u'Pocet hodin "%s" nie je cislo, nahradzujem nulou' % hodin, 'rozsah')
+                hodin = 0
+              else:
+                hodin = int(hodin)
+              x = Sposob(
+                      sposobVyucby=map_sposobVyucby[sposobVyucby[i]],
+                      rozsahHodin=hodin,
+                      rozsahZaObdobie=za_obdobie
+                  )
+              d.sposoby.append(x)
+
+_re_cislo = re.compile(r'^\d+$')
+
+def skontroluj_infolist(d):
+    """Kontroly pre --validate-only, na ktore by sa inak prislo az pri zapise do DB."""
+    with kontrola('datumSchvalenia'):
+        if not d.datumSchvalenia:
+            raise ValueError(u'Chyba datum schvalenia')
+        datetime.datetime.strptime(d.datumSchvalenia, "%d.%m.%Y")
+    if d.kredit is not None and not _re_cislo.match(d.kredit):
+        problem('kredit', u'Pocet kreditov "{}" nie je cislo'.format(d.kredit))
+    if d.sposobVyucby:
+        sposobov = len(d.sposobVyucby.split(' / '))
+        for e in ('rozsahTyzdenny', 'rozsahSemestranly'):
+            hodnota = getattr(d, e)
+            if hodnota and len(hodnota.split(' / ')) != sposobov:
+                problem('rozsah', u'{} "{}" nema rovnaky pocet casti ako sposobVyucby "{}"'.format(
+                  e, hodnota, d.sposobVyucby), uroven='varovanie')
+
+def process_infolist(il, organizacnaJednotka, lang='sk', vsetky_polia=False):
+    d = Infolist(lang=intern_text(lang),
+                 organizacnaJednotka=intern_text(organizacnaJednotka))
+    handlers = element_handlers if vsetky_polia else db_element_handlers
+
+    with context(predmet=il.findtext('kod')):
+        # jeden prechod cez deti elementu, pri opakovanom elemente plati prvy
+        spracovane = set()
+        for child in il:
+            handler = handlers.get(child.tag)
+            if handler is not None and child.tag not in spracovane:
+                spracovane.add(child.tag)
+                with kontrola(child.tag):
+                    handler(d, child)
+
+        # vaha hodnotenia
+        if not d._VH_:
+            d.vahaSkusky = None
+        elif not re.match('^\s*\d+\s*/\s*\d+\s*$', d._VH_):
+            d.vahaSkusky = None
+            warn(u'Nepodarilo sa sparsovat vahu skusky %s pre predmet %s' % (d._VH_, d.kod), '_VH_')
+        else:
+            vahy = d._VH_.split('/')
+            if len(vahy) != 2:
+              raise AssertionError(u'{} {}'.format(d.kod, vahy))
+            d.vahaSkusky = vahy[1]
+
+        # parsovanie sposobu vyucby
+        with kontrola('sposobVyucby'):
+            _parse_sposoby(d)
+
+        with faza('parse_formula'):
+          with kontrola('podmienujucePredmety'):
+            d.podmienujucePredmety = formula(d.podmienujucePredmety)
+          with kontrola('vylucujucePredmety'):
+            d.vylucujucePredmety = formula(d.vylucujucePredmety)
+
+        if _problemy is not None:
+          skontroluj_infolist(d)
+
+    return d
+
+def content_hash(data):
+  return hashlib.sha1(data).hexdigest()
+
+def file_hash(filename):
+  h = hashlib.sha1()
+  with open(filename, 'rb') as f:
+    for chunk in iter(lambda: f.read(1 << 16), b''):
+      h.update(chunk)
+  return h.hexdigest()
+
+class Manifest(object):
+  """Hashe obsahu uz spracovanych suborov a importovanych infolistov.
+
+  Uklada sa do JSON suboru, aby dalsi import mohol preskocit subory, ktore
+  sa odvtedy nezmenili, a ohlasit nove a zmenene infolisty.
+  """
+  def __init__(self, path):
+    self.path = path
+    self.subory = {}
+    self.zaznamy = {}
+    if os.path.exists(path):
+      with open(path, 'r') as f:
+        obsah = json.load(f)
+      self.subory = obsah.get('subory', {})
+      self.zaznamy = obsah.get('zaznamy', {})
+
+  @staticmethod
+  def _stav(zaznam, h):
+    if zaznam is None:
+      return 'novy'
+    elif zaznam['hash'] == h:
+      return 'nezmeneny'
+    return 'zmeneny'
+
+  def stav_suboru(self, filename, h):
+    return self._stav(self.subory.get(os.path.abspath(filename)), h)
+
+  def stav_zaznamu(self, kod, h):
+    return self._stav(self.zaznamy.get(kod), h)
+
+  def overeny_subor(self, filename):
+    """Ci v zaznamenanom subore boli iba infolisty, ktore zapisal import (nie
+    take, ktore uz v DB boli a s exportom sa neporovnali)."""
+    return self.subory.get(os.path.abspath(filename), {}).get('vysledok') == 'spracovany'
+
+  def overeny_zaznam(self, kod):
+    return self.zaznamy.get(kod, {}).get('vysledok') != 'existoval'
+
+  def zaznamenaj_subor(self, filename, h, vysledok='spracovany'):
+    self.subory[os.path.abspath(filename)] = {'hash': h, 'vysledok': vysledok}
+
+  def zaznamenaj_zaznam(self, kod, h, vysledok='importovany'):
+    self.zaznamy[kod] = {'hash': h, 'vysledok': vysledok}
+
+  def save(self):
+    tmp = self.path + '.tmp'
+    with open(tmp, 'w') as f:
+      json.dump({'subory': self.subory, 'zaznamy': self.zaznamy}, f,
+        indent=1, sort_keys=True)
+    os.rename(tmp, self.path)
+
+class Checkpoint(object):
+  """Stav importu s --commit-every po poslednom commite.
+
+  Pamata si subory, ktore uz boli cele commitnute, a infolisty, ktore sa
+  nepodarilo importovat, aby sa preruseny import dal spustit znova a
+  pokracoval tam, kde skoncil. Commitnute infolisty z rozpracovaneho suboru
+  sa preskocia, lebo uz su v DB.
+  """
+  def __init__(self, path):
+    self.path = path
+    self.hotove_subory = []
+    self.chybne = {}
+    if os.path.exists(path):
+      with open(path, 'r') as f:
+        obsah = json.load(f)
+      self.hotove_subory = obsah.get('hotove_subory', [])
+      self.chybne = obsah.get('chybne', {})
+
+  def je_hotovy(self, filename):
+    return os.path.abspath(filename) in self.hotove_subory
+
+  def save(self, hotove_subory, chybne):
+    self.hotove_subory = [os.path.abspath(f) for f in hotove_subory]
+    self.chybne = dict(chybne)
+    tmp = self.path + '.tmp'
+    with open(tmp, 'w') as f:
+      json.dump({'hotove_subory': self.hotove_subory, 'chybne': self.chybne}, f,
+        indent=1, sort_keys=True)
+    os.rename(tmp, self.path)
+
+  def zmaz(self):
+    if os.path.exists(self.path):
+      os.remove(self.path)
+
+class Filter(object):
+  """Rozhoduje, ktore infolisty sa nebudu importovat.
+
+  Staci mu kod predmetu (a pri pouziti manifestu hash infolistu), takze sa
+  da pouzit este pred parsovanim celeho infolistu.
+  """
+  def __init__(self, importovane=(), iba_kody=None, manifest=None, checkpoint=None,
+               aktualizuj=False):
+    self.importovane = importovane
+    self.aktualizuj = aktualizuj
+    self.iba_kody = iba_kody
+    self.manifest = manifest
+    self.checkpoint = checkpoint
+    # (kod, hash, stav) vsetkych infolistov, ktore videl pri pouziti manifestu;
+    # stav je None, ak sa s manifestom neporovnaval
+    self.videne = []
+
+  def __call__(self, kod, h=None):
+    """Vrati dovod preskocenia infolistu, alebo None ak sa ma importovat."""
+    if self.iba_kody != None and not self.iba_kody.match(kod):
+      dovod = u'Preskakujem import infolistu pre predmet {}, lebo nematchuje regex'.format(kod)
+    elif self.checkpoint is not None and kod in self.checkpoint.chybne:
+      dovod = u'Infolist pre predmet %s sa v prerusenom importe nepodarilo importovat' % kod
+    else:
+      return self._porovnaj(kod, h)
+    if self.manifest is not None and h is not None:
+      self.videne.append((kod, h, None))
+    return dovod
+
+  def _porovnaj(self, kod, h):
+    if self.manifest is not None and h is not None:
+      stav = self.manifest.stav_zaznamu(kod, h)
+      self.videne.append((kod, h, stav))
+      # pri aktualizuj iba ak je infolist v DB z tohto exportu, nie 'existoval'
+      if (stav == 'nezmeneny' and kod in self.importovane and
+          (not self.aktualizuj or self.manifest.overeny_zaznam(kod))):
+        return u'Infolist pre predmet %s sa od posledneho importu nezmenil' % kod
+      elif stav == 'zmeneny':
+        info(u'Infolist pre predmet %s sa od posledneho importu zmenil' % kod, 'manifest')
+      elif stav == 'novy':
+        info(u'Infolist pre predmet %s je novy' % kod, 'manifest')
+    if kod in self.importovane and not self.aktualizuj:
+      return u"Infolist pre predmet %s uz existuje" % kod
+    return None
+
+def iter_file(filename, lang='sk', preskoc=None, hashuj=False, vsetky_polia=False):
+  """Postupne parsuje XML subor a vracia (yield) po jednom sparsovany infolist.
+
+  Spracovane elementy informacnyList sa hned odstranuju zo stromu, takze
+  pamat nezavisi od velkosti suboru. Ak je zadany preskoc (napr. Filter),
+  infolisty, pre ktore vrati dovod, sa vobec neparsuju. Pri hashuj sa ku
+  kazdemu infolistu zapamata hash jeho XML (pole hash). Elementy, ktore
+  sa nezapisuju do DB, sa parsuju iba pri vsetky_polia.
+  """
+  infolisty = _iter_infolisty(filename, lang, preskoc, hashuj, vsetky_polia)
+  if _profil is not None:
+    # jedna faza na infolist, nie na kazdu udalost iterparse; extrakcia
+    # a hash su vnorene fazy, takze sa do xml nezapocitaju
+    infolisty = _meraj_iter(infolisty, 'xml')
+  for d in infolisty:
+    if d is not None:
+      yield d
+
+def _iter_infolisty(filename, lang, preskoc, hashuj, vsetky_polia):
+  """Vrati (yield) pre kazdy element informacnyList sparsovany infolist,
+  alebo None, ak sa preskocil."""
+  organizacnaJednotka = None
+  ilisty = None
+  path = []
+  for event, elem in ET.iterparse(filename, events=('start', 'end')):
+    if event == 'start':
+      path.append(elem.tag)
+      if len(path) == 2 and elem.tag == 'informacneListy':
+        ilisty = elem
+      continue
+    path.pop()
+    if len(path) == 1 and elem.tag == 'organizacnaJednotka':
+      organizacnaJednotka = elem.text
+    elif len(path) == 2 and elem.tag == 'informacnyList' and ilisty is not None:
+      h = None
+      kod = elem.findtext('kod')
+      if hashuj:
+        with faza('hash'):
+          h = content_hash(ET.tostring(elem))
+      dovod = None
+      if preskoc is not None:
+        dovod = preskoc(kod, h)
+      d = None
+      if dovod is not None:
+        info(dovod, 'preskakujem')
+      else:
+        with context(line=getattr(elem, 'sourceline', None)), faza('extrakcia', kod), \
+             kontrola('infolist'):
+          d = process_infolist(elem, organizacnaJednotka, lang=lang,
+                               vsetky_polia=vsetky_polia)
+        if hashuj and d is not None:
+          d.hash = h
+      # uvolnime spracovany element aj jeho predchadzajucich surodencov
+      elem.clear()
+      while len(ilisty):
+        first = ilisty[0]
+        del ilisty[0]
+        if first is elem:
+          break
+      yield d
+
+def process_file(filename, **kwargs):
+    return list(iter_file(filename, **kwargs))
+
+# zvysit pri kazdej zmene parsovania, po ktorej by sa z cache citali stare vysledky
+PARSER_VERSION = 5
+
+class Cache(object):
+  """Sparsovane infolisty ulozene na disku, aby sa opakovany import (napr.
+  po --dry-run) nemusel znova parsovat XML.
+
+  Kazdy subor ma v adresari jeden zaznam (pickle skomprimovany zlib-om)
+  s klucom podla cesty, velkosti a casu zmeny suboru, verzie parsera a
+  parametrov parsovania, takze zmeneny subor sa automaticky parsuje znova.
+  Ak cache prekroci max_velkost bajtov, mazu sa najdlhsie nepouzite zaznamy.
+  """
+  def __init__(self, adresar, max_velkost=512 * 1024 * 1024):
+    self.adresar = adresar
+    self.max_velkost = max_velkost
+    if not os.path.isdir(adresar):
+      os.makedirs(adresar)
+
+  def _cesta(self, filename, kwargs):
+    st = os.stat(filename)
+    kluc = repr((os.path.abspath(filename), st.st_size, st.st_mtime, PARSER_VERSION,
+      ET.__name__, kwargs.get('lang', 'sk'), bool(kwargs.get('hashuj')),
+      bool(kwargs.get('vsetky_polia'))))
+    return os.path.join(self.adresar, hashlib.sha1(kluc).hexdigest() + '.cache')
+
+  def nacitaj(self, filename, kwargs):
+    """Vrati zoznam dvojic (infolist, diagnostika), alebo None."""
+    cesta = self._cesta(filename, kwargs)
+    try:
+      with open(cesta, 'rb') as f:
+        zaznamy = pickle.loads(zlib.decompress(f.read()))
+      os.utime(cesta, None) # pre mazanie najdlhsie nepouzitych
+    except (IOError, OSError):
+      return None
+    except Exception:
+      warn(u'Poskodeny zaznam v cache {}, parsujem znova'.format(cesta), 'cache')
+      return None
+    return zaznamy
+
+  def uloz(self, filename, kwargs, zaznamy):
+    cesta = self._cesta(filename, kwargs)
+    tmp = '{}.{}.tmp'.format(cesta, os.getpid())
+    with open(tmp, 'wb') as f:
+      f.write(zlib.compress(pickle.dumps(zaznamy, pickle.HIGHEST_PROTOCOL), 1))
+    os.rename(tmp, cesta)
+    self.uprac()
+
+  def uprac(self):
+    zaznamy = []
+    for cesta in glob.glob(os.path.join(self.adresar, '*.cache')):
+      try:
+        st = os.stat(cesta)
+      except OSError: # medzitym ho zmazal iny proces
+        continue
+      zaznamy.append((st.st_mtime, st.st_size, cesta))
+    velkost = sum(z[1] for z in zaznamy)
+    for mtime, size, cesta in sorted(zaznamy):
+      if velkost <= self.max_velkost:
+        break
+      try:
+        os.remove(cesta)
+      except OSError:
+        pass
+      velkost -= size
+
+def _parsuj_do_cache(filename, kwargs):
+  """Sparsuje cely subor (bez preskakovania) a ku kazdemu infolistu
+  zapamata diagnostiku, ktora pri nom vznikla."""
+  global _warn_sink
+  povodny = _warn_sink
+  zaznamy = []
+  _warn_sink = []
+  try:
+    for d in iter_file(filename, **kwargs):
+      zaznamy.append((d, _warn_sink))
+      _warn_sink = []
+  except:
+    diagnostika = [z for d, zz in zaznamy for z in zz] + _warn_sink
+    _warn_sink = povodny
+    for z in diagnostika:
+      emit(z)
+    raise
+  _warn_sink = povodny
+  return zaznamy
+
+def iter_file_cached(filename, cache, preskoc=None, **kwargs):
+  """Ako iter_file, ale infolisty berie z cache, ak tam su.
+
+  Filter preskoc sa pouzije az na sparsovane infolisty, aby zaznam v cache
+  nezavisel od stavu DB.
+  """
+  with faza('cache'):
+    zaznamy = cache.nacitaj(filename, kwargs)
+  if zaznamy is None:
+    zaznamy = _parsuj_do_cache(filename, kwargs)
+    with faza('cache'):
+      cache.uloz(filename, kwargs, zaznamy)
+  for d, diagnostika in zaznamy:
+    dovod = None
+    if preskoc is not None:
+      dovod = preskoc(d.kod, d.hash)
+    if dovod is not None:
+      info(dovod, 'preskakujem')
+      continue
+    for z in diagnostika:
+      emit(z)
+    yield d
+
+def _iter_subor(filename, cache, kwargs):
+  if cache is None:
+    return iter_file(filename, **kwargs)
+  return iter_file_cached(filename, cache, **kwargs)
+
+def _parse_worker(args):
+  """Sparsuje jeden subor v pracovnom procese.
+
+  Vracia (infolisty, diagnostika, traceback, videne, profil); diagnostiku
+  vypise az hlavny proces, aby sa nemiesala s vystupom ostatnych procesov.
+  """
+  global _warn_sink, _profil
+  filename, kwargs, cache, profiluj = args
+  preskoc = kwargs.get('preskoc')
+  _warn_sink = []
+  _profil = Profil() if profiluj else None
+  _context[:] = [{'subor': os.path.basename(filename)}]
+  videne = preskoc.videne if preskoc is not None else []
+  try:
+    with faza('parsovanie'):
+      data = list(_iter_subor(filename, cache, kwargs))
+    tb = None
+  except Exception:
+    data = None
+    tb = traceback.format_exc()
+  finally:
+    diagnostika = _warn_sink
+    profil = _profil.data() if _profil is not None else None
+    _warn_sink = None
+    _profil = None
+    del _context[:]
+  return data, diagnostika, tb, videne, profil
+
+def _v_poradi(pool, fn, ulohy, okno):
+  """Ako pool.imap, ale naraz je rozbehnutych najviac okno uloh, takze sa
+  v pamati nehromadia vysledky, ktore este nikto necita."""
+  rozbehnute = deque()
+  for uloha in ulohy:
+    rozbehnute.append(pool.apply_async(fn, (uloha,)))
+    if len(rozbehnute) >= okno:
+      yield rozbehnute.popleft().get()
+  while rozbehnute:
+    yield rozbehnute.popleft().get()
+
+def parse_files(filenames, jobs=1, cache=None, **kwargs):
+  """Pre kazdy neprazdny subor vrati (yield) dvojicu (subor, infolisty).
+
+  Pri jobs > 1 sa subory parsuju paralelne v jobs procesoch, vysledky vsak
+  prichadzaju v rovnakom poradi ako filenames a dopredu sa parsuje najviac
+  2 * jobs suborov. Ak je zadana cache, subory sa parsuju iba ak v nej nie
+  su. Ostatne argumenty dostane iter_file.
+  """
+  preskoc = kwargs.get('preskoc')
+  prazdne = set(f for f in filenames if os.stat(f).st_size == 0)
+  neprazdne = [f for f in filenames if f not in prazdne]
+  if jobs > 1 and neprazdne:
+    pool = multiprocessing.Pool(jobs)
+    vysledky = _v_poradi(pool, _parse_worker,
+      ((f, kwargs, cache, _profil is not None) for f in neprazdne), 2 * jobs)
+  else:
+    pool = None
+  try:
+    for f in filenames:
+      if f in prazdne:
+        with context(subor=os.path.basename(f)):
+          warn('Prekakujem prazdny subor {}'.format(os.path.basename(f)), 'subor')
+        continue
+      if pool is None:
+        yield f, _iter_subor(f, cache, kwargs)
+        continue
+      data, diagnostika, tb, videne, profil = next(vysledky)
+      if preskoc is not None:
+        preskoc.videne.extend(videne)
+      if profil is not None:
+        _profil.zluc(profil)
+      for z in diagnostika:
+        emit(z)
+      if tb is not None:
+        _diagnostika.flush()
+        sys.stderr.write(tb)
+        raise RuntimeError('Nepodarilo sa sparsovat subor {}'.format(os.path.basename(f)))
+      yield f, data
+    if pool is not None:
+      pool.close()
+      pool.join()
+  finally:
+    if pool is not None:
+      pool.terminate()
+
+class _Zastavene(Exception):
+  pass
+
+def _producent(fronta, stop, filenames, kwargs, profiluj):
+  """Proces, ktory parsuje subory (cez parse_files) a posiela infolisty do fronty.
+
+  Kazda sprava je (typ, diagnostika, ...), kde diagnostika su zaznamy, ktore
+  vznikli od predchadzajucej spravy; hlavny proces ich vypise v rovnakom
+  poradi, ako keby parsoval sam.
+  """
+  global _warn_sink, _profil
+  _warn_sink = []
+  _profil = Profil() if profiluj else None
+  del _context[:]
+  preskoc = kwargs.get('preskoc')
+
+  def posli(typ, *args):
+    global _warn_sink
+    sprava = (typ, _warn_sink) + args
+    _warn_sink = []
+    # pri plnej fronte cakame (backpressure), kym nas hlavny proces nezastavi
+    while not stop.is_set():
+      try:
+        fronta.put(sprava, True, 0.1)
+        return
+      except Queue.Full:
+        pass
+    raise _Zastavene()
+
+  try:
+    try:
+      for f, data in parse_files(filenames, **kwargs):
+        with context(subor=os.path.basename(f)):
+          posli('subor', f)
+          for d in data:
+            posli('zaznam', d)
+          videne = preskoc.videne if preskoc is not None else []
+          posli('koniec', list(videne))
+          del videne[:]
+      posli('hotovo', _profil.data() if _profil is not None else None)
+    except _Zastavene:
+      raise
+    except Exception:
+      posli('chyba', traceback.format_exc())
+  except _Zastavene:
+    # neposlane spravy uz nikto necita, proces nema na ne cakat pri skonceni
+    fronta.cancel_join_thread()
+
+def _prijmi(fronta, proces):
+  while True:
+    try:
+      with faza('cakanie'):
+        return fronta.get(True, 1)
+    except Queue.Empty:
+      if not proces.is_alive():
+        raise RuntimeError('Proces parsujuci subory neocakavane skoncil')
+
+def parse_files_pipeline(filenames, velkost, **kwargs):
+  """Ako parse_files, ale subory sa parsuju v samostatnom procese sucasne so
+  zapisom do DB.
+
+  Infolisty idu cez frontu s najviac velkost zaznamami, ked je plna, parser
+  caka. Ak zapis skonci chybou (alebo sa prestane citat), parser sa zastavi.
+  """
+  preskoc = kwargs.get('preskoc')
+  fronta = multiprocessing.Queue(velkost)
+  stop = multiprocessing.Event()
+  proces = multiprocessing.Process(target=_producent,
+    args=(fronta, stop, filenames, kwargs, _profil is not None))
+  proces.start()
+
+  def spravy():
+    while True:
+      sprava = _prijmi(fronta, proces)
+      for z in sprava[1]:
+        emit(z)
+      if sprava[0] == 'chyba':
+        sys.stderr.write(sprava[2])
+        raise RuntimeError('Parsovanie zlyhalo: {}'.format(sprava[2].strip().splitlines()[-1]))
+      yield sprava
+
+  def zaznamy_suboru(spravy):
+    for sprava in spravy:
+      if sprava[0] == 'zaznam':
+        yield sprava[2]
+      else: # koniec
+        if preskoc is not None:
+          preskoc.videne.extend(sprava[2])
+        return
+
+  try:
+    prijate = spravy()
+    for sprava in prijate:
+      typ = sprava[0]
+      if typ == 'subor':
+        data = zaznamy_suboru(prijate)
+        yield sprava[2], data
+        for d in data: # ak by zapis neprecital vsetky infolisty suboru
+          pass
+      elif typ == 'hotovo':
+        if sprava[2] is not None:
+          _profil.zluc(sprava[2])
+        break
+  finally:
+    stop.set()
+    proces.join(5)
+    if proces.is_alive():
+      proces.terminate()
+      proces.join()
+
+def nacitaj_preklady(jazyky, jobs=1, cache=None, iba_kody=None, importovane=(),
+                     aktualizuj=False):
+  """Sparsuje exporty v dalsich jazykoch.
+
+  jazyky je zoznam dvojic (jazyk, subory); subory kazdeho jazyka sa parsuju
+  paralelne ako v parse_files. Predmety, ktore sa preskocia (iba_kody,
+  importovane ako vo Filter), sa ani neparsuju. Vrati slovnik kod
+  predmetu -> zoznam Preklad v poradi jazykov.
+  """
+  preklady = {}
+  for jazyk, filenames in jazyky:
+    with faza('preklady'):
+      subory = parse_files(filenames, jobs=jobs, cache=cache, lang=jazyk,
+                           preskoc=Filter(importovane, iba_kody, aktualizuj=aktualizuj))
+      with closing(subory):
+        for f, data in subory:
+          with context(subor=os.path.basename(f)):
+            for d in data:
+              zoznam = preklady.setdefault(d.kod, [])
+              if zoznam and zoznam[-1].lang == d.lang:
+                warn(u'Preklad ({}) pre predmet {} je v exporte viackrat, beriem prvy'.format(
+                  jazyk, d.kod), 'preklad')
+                continue
+              zoznam.append(Preklad(**dict((pole, getattr(d, pole))
+                                           for pole in Preklad.__slots__)))
+  return preklady
+
+# stlpce infolist_verzia v poradi, v akom ich vracia verzia_values
+verzia_columns = ('podm_absol_percenta_skuska', 'hodnotenia_a_pocet',
+    'hodnotenia_b_pocet', 'hodnotenia_c_pocet', 'hodnotenia_d_pocet',
+    'hodnotenia_e_pocet', 'hodnotenia_fx_pocet', 'modifikovane',
+    'modifikoval', 'hromadna_zmena',
+    'pocet_kreditov', 'fakulta', 'podmienujuce_predmety',
+    'odporucane_predmety', 'vylucujuce_predmety', 'potrebny_jazyk',
+    'treba_zmenit_kod', 'predpokladany_semester')
+
+preklad_columns = ('jazyk_prekladu', 'nazov_predmetu', 'podm_absol_priebezne',
+    'podm_absol_skuska', 'vysledky_vzdelavania', 'strucna_osnova')
+
+def verzia_values(d, user, podm_s_idckami, vyluc_s_idckami):
+  """Hodnoty verzia_columns; formuly su uz texty s idckami predmetov."""
+  hodnotenia = {}
+  for hodn in ['A', 'B', 'C', 'D', 'E', 'FX']:
+    if hodn in d.hodnoteniaPredmetu:
+      hodnotenia[hodn] = d.hodnoteniaPredmetu[hodn].pocetHodnoteni
+    else:
+      hodnotenia[hodn] = None
+  return (
+      d.vahaSkusky,
+      hodnotenia['A'],
+      hodnotenia['B'],
+      hodnotenia['C'],
+      hodnotenia['D'],
+      hodnotenia['E'],
+      hodnotenia['FX'],
+      datetime.datetime.strptime(d.datumSchvalenia,"%d.%m.%Y"),
+      user,
+      True, # hromadna zmena
+      d.kredit,
+      'FMFI',
+      podm_s_idckami,
+      '',
+      vyluc_s_idckami,
+      'sk_en',
+      False,
+      d.kodSemesterStudPlan
+  )
+
+def preklad_values(d):
+  #if d['_C_']:
+  #  vysledky_vzdelavania = u'''Tento obsah bol automaticky importovaný z položky "ciele predmetu", je potrebné ho zmeniť podľa požiadaviek na "výsledky vzdelávania"!\n\n'''
+  #  vysledky_vzdelavania += d['_C_']
+  #else:
+  #  vysledky_vzdelavania = ''
+
+  if d._VV_:
+    vysledky_vzdelavania = d._VV_
+  else:
+    vysledky_vzdelavania = ''
 
-        data.append(d)
+  return (d.lang, d.nazov, d._P_, d._Z_, vysledky_vzdelavania, d._SO_)
 
-    return data
+def preklady_values(d):
+  """Riadky infolist_verzia_preklad: jazyk infolistu a jeho preklady."""
+  return [preklad_values(p) for p in [d] + (d.preklady or [])]
 
-def import2db(con, data, user, iba_kody=None, dry_run=False):
-    """ import do cistej db"""
-    def vytvor_alebo_najdi_predmet(kod_predmetu, skratka=None):
-      with closing(con.cursor()) as cur:
-        if skratka == None:
-          skratka = kod2skratka(kod_predmetu)
-        cur.execute('''SELECT id FROM predmet WHERE kod_predmetu = %s''', (kod_predmetu,))
+def vyucujuci_values(d, najdi_osoby):
+  """Priradi vyucujucim idcka osob.
+
+  Vracia zoznam (poradie, osoba) a zoznam (osoba, typ_vyucujuceho) bez
+  duplikatov.
+  """
+  vyucujuci_rows = []
+  typy = []
+  poradie = 1
+  vlozeny = set()
+  for vyucujuci in d.vyucujuciAll:
+      ids = najdi_osoby(vyucujuci.plneMeno)
+      if len(ids) > 1:
+          warn(u"Nasiel som duplikovany zaznam pre vyucujuceho %s na predmete %s"
+                  % (vyucujuci.plneMeno, d.kod), 'vyucujuci')
+          continue
+      elif len(ids) == 0:
+          warn(u"Nenasiel som ziadny zaznam pre vyucujuceho %s na predmete %s"
+                  % (vyucujuci.plneMeno, d.kod), 'vyucujuci')
+          continue
+
+      vyucujuci_id = ids[0]
+
+      if vyucujuci_id not in vlozeny:
+          vyucujuci_rows.append((poradie, vyucujuci_id))
+          vlozeny.add(vyucujuci_id)
+          poradie += 1
+
+      # zabranit potencialnym duplikatom
+      typ = (vyucujuci_id, vyucujuci.typ)
+      if typ not in typy:
+          typy.append(typ)
+  return vyucujuci_rows, typy
+
+class Resolver(object):
+  """Idcka osob a predmetov nacitane z DB raz na cely import.
+
+  Nove predmety sa do slovnika pridavaju hned ako sa vlozia do DB, kody
+  predmetov s novym infolistom do mnoziny importovane. S overuj (pri
+  --db-workers) sa predmet pred vytvorenim aj infolist pred zapisom este
+  hladaju priamo v DB, lebo slovniky mohli zastarat, kym import cakal na
+  iny import (vid zapis_paralelne).
+  """
+  def __init__(self, con):
+    self.con = con
+    self.overuj = False
+    self.osoby = {}
+    self.predmety = {}
+    self.importovane = set()
+    # kody predmetov vlozenych pocas importu, v poradi vkladania
+    self.nove_predmety = []
+    with closing(con.cursor()) as cur:
+      # mena a kody sa porovnavaju s unicode z XML, nie s bajtmi z DB
+      psycopg2.extensions.register_type(psycopg2.extensions.UNICODE, cur)
+      cur.execute('SELECT cele_meno, id FROM osoba ORDER BY id')
+      for cele_meno, osoba_id in cur:
+        self.osoby.setdefault(cele_meno, []).append(osoba_id)
+      cur.execute('SELECT kod_predmetu, id FROM predmet ORDER BY id')
+      for kod_predmetu, predmet_id in cur:
+        self.predmety.setdefault(kod_predmetu, predmet_id)
+      cur.execute('''SELECT DISTINCT p.kod_predmetu
+                     FROM predmet p
+                     JOIN predmet_infolist pi ON pi.predmet = p.id''')
+      self.importovane.update(row[0] for row in cur)
+
+  def najdi_osoby(self, meno):
+    return self.osoby.get(meno, [])
+
+  def prepoj(self, con):
+    """Dalej pouziva spojenie con a overuje predmety v DB (pre --db-workers)."""
+    self.con = con
+    self.overuj = True
+    self.nove_predmety = []
+
+  def ma_infolist(self, kod_predmetu):
+    """Zisti, ci uz predmet ma v DB infolist."""
+    with closing(self.con.cursor()) as cur:
+      cur.execute('''SELECT EXISTS (SELECT 1 FROM predmet p
+                       JOIN predmet_infolist pi ON pi.predmet = p.id
+                     WHERE p.kod_predmetu = %s)''', (kod_predmetu,))
+      return cur.fetchone()[0]
+
+  def vytvor_alebo_najdi_predmet(self, kod_predmetu, skratka=None):
+    if kod_predmetu in self.predmety:
+      return self.predmety[kod_predmetu]
+    if skratka == None:
+      skratka = kod2skratka(kod_predmetu)
+    with closing(self.con.cursor()) as cur:
+      if self.overuj:
+        cur.execute('SELECT id FROM predmet WHERE kod_predmetu = %s ORDER BY id LIMIT 1',
+                    (kod_predmetu,))
         row = cur.fetchone()
-        if row:
+        if row is not None: # medzitym ho vytvoril iny import
+          self.predmety[kod_predmetu] = row[0]
           return row[0]
-        else:
-          cur.execute('''INSERT INTO predmet (kod_predmetu, skratka,
-                        povodny_kod, povodna_skratka)
-                      VALUES (%s, %s, %s, %s)
-                      RETURNING id''',
-                      (kod_predmetu, skratka, kod_predmetu, skratka))
-          return cur.fetchone()[0]
+      cur.execute('''INSERT INTO predmet (kod_predmetu, skratka,
+                    povodny_kod, povodna_skratka)
+                  VALUES (%s, %s, %s, %s)
+                  RETURNING id''',
+                  (kod_predmetu, skratka, kod_predmetu, skratka))
+      predmet_id = cur.fetchone()[0]
+    self.predmety[kod_predmetu] = predmet_id
+    self.nove_predmety.append(kod_predmetu)
+    return predmet_id
+
+  def zabudni_predmety(self, pocet):
+    """Zabudne predmety vlozene po prvych pocet novych predmetoch (po
+    rollbacku savepointu uz v DB nie su)."""
+    for kod_predmetu in self.nove_predmety[pocet:]:
+      del self.predmety[kod_predmetu]
+    del self.nove_predmety[pocet:]
+
+def _popis_chyby(e):
+  try:
+    text = unicode(e)
+  except UnicodeDecodeError:
+    text = str(e).decode('UTF-8', 'replace')
+  # z chyb PostgreSQL staci prvy riadok, dalej je iba vypis dotazu
+  return u'{}: {}'.format(type(e).__name__, text.strip().split(u'\n')[0])
+
+class Davkovanie(object):
+  """Transakcie pri zapise infolistov do DB.
+
+  Bez commit_every sa vsetko zapise v jednej transakcii a chyba v infoliste
+  ukonci import. S commit_every sa kazdy infolist zapisuje v savepointe,
+  chybny infolist sa vrati spat a ohlasi, a po kazdych commit_every
+  infolistoch sa commitne a ulozi checkpoint (pri dry_run sa necommituje).
+  """
+  def __init__(self, con, resolver, commit_every=None, dry_run=False, checkpoint=None):
+    self.con = con
+    self.resolver = resolver
+    self.commit_every = commit_every
+    self.dry_run = dry_run
+    self.checkpoint = checkpoint
+    self.hotove_subory = list(checkpoint.hotove_subory) if checkpoint else []
+    self.chybne = dict(checkpoint.chybne) if checkpoint else {}
+    self.necommitnute = 0
+
+  @contextmanager
+  def zaznam(self, kod):
+    if not self.commit_every:
+      yield
+      return
+    nove_predmety = len(self.resolver.nove_predmety)
+    with closing(self.con.cursor()) as cur:
+      cur.execute('SAVEPOINT infolist')
+      try:
+        yield
+      except Exception as e:
+        cur.execute('ROLLBACK TO SAVEPOINT infolist')
+        self.resolver.zabudni_predmety(nove_predmety)
+        self.chybne[kod] = _popis_chyby(e)
+        warn(u'Infolist pre predmet {} sa nepodarilo importovat: {}'.format(
+          kod, self.chybne[kod]), 'import', uroven='chyba')
+      cur.execute('RELEASE SAVEPOINT infolist')
+    self.necommitnute += 1
+
+  def commit_ak_treba(self):
+    """Commitne, ak sa od posledneho commitu zapisalo commit_every infolistov."""
+    if self.commit_every and self.necommitnute >= self.commit_every:
+      self.commit()
+
+  def subor_hotovy(self, filename):
+    self.hotove_subory.append(filename)
+
+  def commit(self):
+    if self.dry_run:
+      return
+    with faza('commit'):
+      self.con.commit()
+    self.necommitnute = 0
+    # commitnute predmety uz netreba vediet vratit
+    del self.resolver.nove_predmety[:]
+    if self.checkpoint is not None:
+      self.checkpoint.save(self.hotove_subory, self.chybne)
+
+class PoslednaVerzia(_Zaznam):
+  """Posledna verzia infolistu v DB (vid nacitaj_posledne_verzie)."""
+  __slots__ = ('infolist', 'id', 'hodnoty', 'preklady', 'vyucujuci', 'typy',
+               'cinnosti', 'literatura', 'suvisiace')
+
+# stlpce verzie, ktore sa pri --update neporovnavaju
+ignorovane_columns = ('modifikoval', 'hromadna_zmena')
+
+_re_cele_cislo = re.compile(r'^\s*-?\d+\s*$')
+
+def _porovnatelne(v):
+  """Hodnota z DB alebo z XML v tvare, v akom sa daju porovnat: texty ako
+  unicode, cisla zapisane textom ako int."""
+  if isinstance(v, str):
+    v = v.decode('UTF-8')
+  if isinstance(v, unicode) and _re_cele_cislo.match(v):
+    return int(v)
+  return v
+
+def nacitaj_posledne_verzie(cur, kody):
+  """Nacita naraz posledne verzie infolistov predmetov s danymi kodmi aj
+  s prekladmi, vyucujucimi, cinnostami, literaturou a suvisiacimi
+  predmetmi. Vrati slovnik kod predmetu -> PoslednaVerzia.
+  """
+  stare = {}
+  if not kody:
+    return stare
+  with closing(cur.connection.cursor()) as c:
+    psycopg2.extensions.register_type(psycopg2.extensions.UNICODE, c)
+    c.execute('''SELECT DISTINCT ON (p.kod_predmetu) p.kod_predmetu, i.id, i.posledna_verzia
+                 FROM predmet p
+                 JOIN predmet_infolist pi ON pi.predmet = p.id
+                 JOIN infolist i ON i.id = pi.infolist
+                 WHERE p.kod_predmetu = ANY(%s)
+                 ORDER BY p.kod_predmetu, i.id''', (list(kody),))
+    verzie = {}
+    for kod, infolist_id, verzia_id in c:
+      stare[kod] = verzie[verzia_id] = PoslednaVerzia(infolist=infolist_id, id=verzia_id,
+        preklady={}, vyucujuci=[], typy=[], cinnosti=[], literatura=set(), suvisiace=set())
+    ids = list(verzie)
+    c.execute('SELECT id, {} FROM infolist_verzia WHERE id = ANY(%s)'.format(
+      ', '.join(verzia_columns)), (ids,))
+    for row in c:
+      verzie[row[0]].hodnoty = row[1:]
+    c.execute('SELECT infolist_verzia, {} FROM infolist_verzia_preklad WHERE infolist_verzia = ANY(%s)'.format(
+      ', '.join(preklad_columns)), (ids,))
+    for row in c:
+      verzie[row[0]].preklady[row[1]] = row[2:]
+    c.execute('''SELECT infolist_verzia, poradie, osoba FROM infolist_verzia_vyucujuci
+                 WHERE infolist_verzia = ANY(%s) ORDER BY infolist_verzia, poradie''', (ids,))
+    for verzia_id, poradie, osoba in c:
+      verzie[verzia_id].vyucujuci.append((poradie, osoba))
+    c.execute('''SELECT infolist_verzia, osoba, typ_vyucujuceho FROM infolist_verzia_vyucujuci_typ
+                 WHERE infolist_verzia = ANY(%s)''', (ids,))
+    for verzia_id, osoba, typ in c:
+      verzie[verzia_id].typy.append((osoba, typ))
+    c.execute('''SELECT infolist_verzia, metoda_vyucby, druh_cinnosti, pocet_hodin, za_obdobie
+                 FROM infolist_verzia_cinnosti WHERE infolist_verzia = ANY(%s)''', (ids,))
+    for row in c:
+      verzie[row[0]].cinnosti.append(row[1:])
+    c.execute('''SELECT infolist_verzia, bib_id FROM infolist_verzia_literatura
+                 WHERE infolist_verzia = ANY(%s)''', (ids,))
+    for verzia_id, bib_id in c:
+      verzie[verzia_id].literatura.add(bib_id)
+    c.execute('''SELECT infolist_verzia, predmet FROM infolist_verzia_suvisiace_predmety
+                 WHERE infolist_verzia = ANY(%s)''', (ids,))
+    for verzia_id, predmet_id in c:
+      verzie[verzia_id].suvisiace.add(predmet_id)
+  return stare
+
+def nacitaj_literaturu(cur, skratky):
+  """Literatura, ktoru by import priradil predmetom so skratkami:
+  skratka -> set(bib_id).
+
+  Poradie sa neporovnava, stary import ho cisloval inak.
+  """
+  literatura = {}
+  if not skratky:
+    return literatura
+  with closing(cur.connection.cursor()) as c:
+    psycopg2.extensions.register_type(psycopg2.extensions.UNICODE, c)
+    c.execute('''SELECT kod_predmetu, bib_id FROM literatura_pre_import_predmetov
+                 WHERE kod_predmetu = ANY(%s)''', (list(set(skratky)),))
+    for skratka, bib_id in c:
+      literatura.setdefault(skratka, set()).add(bib_id)
+  return literatura
+
+def porovnaj(d, stara, resolver, literatura):
+  """Porovna infolist d s jeho poslednou verziou v DB.
+
+  Vrati zoznam zmien (prazdny, ak sa nic nezmenilo) a vyucujuci_values(d, ...).
+  Preklady v jazykoch, ktore d nema, sa neporovnavaju.
+  """
+  # odkaz na este neexistujuci predmet da None, cize zmenu
+  podm_s_idckami, podm_predmety = d.podmienujucePredmety.s_idckami(resolver.predmety.get)
+  vyluc_s_idckami, vyluc_predmety = d.vylucujucePredmety.s_idckami(resolver.predmety.get)
+  zmeny = []
+  for stlpec, stara_hodnota, nova_hodnota in zip(verzia_columns, stara.hodnoty,
+      verzia_values(d, None, podm_s_idckami, vyluc_s_idckami)):
+    if stlpec in ignorovane_columns:
+      continue
+    if _porovnatelne(stara_hodnota) != _porovnatelne(nova_hodnota):
+      if stlpec in ('podmienujuce_predmety', 'vylucujuce_predmety'):
+        zmeny.append(stlpec)
+      else:
+        zmeny.append(u'{} ({} -> {})'.format(stlpec, stara_hodnota, nova_hodnota))
+  for preklad in preklady_values(d):
+    stare_texty = stara.preklady.get(preklad[0])
+    if stare_texty is None:
+      zmeny.append(u'preklad {}: novy'.format(preklad[0]))
+      continue
+    zmenene = [stlpec for stlpec, a, b in zip(preklad_columns[1:], stare_texty, preklad[1:])
+               if _porovnatelne(a) != _porovnatelne(b)]
+    if zmenene:
+      zmeny.append(u'preklad {}: {}'.format(preklad[0], u', '.join(zmenene)))
+  vyucujuci = vyucujuci_values(d, resolver.najdi_osoby)
+  vyucujuci_rows, typy = vyucujuci
+  if (vyucujuci_rows != stara.vyucujuci or
+      sorted((o, _porovnatelne(t)) for o, t in typy) !=
+      sorted((o, _porovnatelne(t)) for o, t in stara.typy)):
+    zmeny.append(u'vyucujuci')
+  cinnosti = [(d.metodaStudia, s.sposobVyucby, s.rozsahHodin, s.rozsahZaObdobie)
+              for s in d.sposoby]
+  if (sorted(tuple(map(_porovnatelne, c)) for c in cinnosti) !=
+      sorted(tuple(map(_porovnatelne, c)) for c in stara.cinnosti)):
+    zmeny.append(u'cinnosti')
+  if literatura != stara.literatura:
+    zmeny.append(u'literatura')
+  if set.union(podm_predmety, vyluc_predmety) != stara.suvisiace:
+    zmeny.append(u'suvisiace_predmety')
+  return zmeny, vyucujuci
+
+def aktualizuj_infolist(cur, d, user, resolver, stara, literatura):
+    """Pri --update: ak sa infolist d lisi od poslednej verzie stara, zapise
+    novu verziu a nastavi ju ako poslednu. Vrati, ci sa nieco zmenilo."""
+    zmeny, vyucujuci = porovnaj(d, stara, resolver, literatura)
+    if not zmeny:
+        info(u'Infolist pre predmet %s sa nezmenil' % d.kod, 'nezmeneny')
+        return False
+    info(u'Infolist pre predmet {} sa zmenil: {}'.format(d.kod, u'; '.join(zmeny)), 'zmeneny')
+    infolist_verzia_id = zapis_verziu(cur, d, user, resolver, predchadzajuca_verzia=stara.id,
+                                      vyucujuci=vyucujuci)
+    # preklady v jazykoch, ktore tento import nemal, sa prenesu z predchadzajucej verzie
+    cur.execute('''INSERT INTO infolist_verzia_preklad (infolist_verzia, {0})
+                   SELECT %s, {0} FROM infolist_verzia_preklad
+                   WHERE infolist_verzia = %s AND NOT (jazyk_prekladu = ANY(%s))'''.format(
+                   ', '.join(preklad_columns)),
+                (infolist_verzia_id, stara.id, [p[0] for p in preklady_values(d)]))
+    cur.execute('UPDATE infolist SET posledna_verzia = %s WHERE id = %s',
+                (infolist_verzia_id, stara.infolist))
+    return True
+
+def zapis_verziu(cur, d, user, resolver, predchadzajuca_verzia=None, vyucujuci=None):
+    """Zapise infolist d ako novu verziu (infolist_verzia a suvisiace tabulky),
+    vrati jej id. vyucujuci su uz vypocitane vyucujuci_values(d, ...)."""
+    vytvor_alebo_najdi_predmet = resolver.vytvor_alebo_najdi_predmet
+    podm_s_idckami, podm_predmety = d.podmienujucePredmety.s_idckami(vytvor_alebo_najdi_predmet)
+    vyluc_s_idckami, vyluc_predmety = d.vylucujucePredmety.s_idckami(vytvor_alebo_najdi_predmet)
+
+    columns = verzia_columns
+    values = verzia_values(d, user, podm_s_idckami, vyluc_s_idckami)
+    if predchadzajuca_verzia is not None:
+        columns += ('predchadzajuca_verzia',)
+        values += (predchadzajuca_verzia,)
+    cur.execute('''INSERT INTO infolist_verzia ({}) VALUES ({}) RETURNING id'''.format(
+        u', '.join(columns), u', '.join(['%s'] * len(columns))), values)
+    infolist_verzia_id = cur.fetchone()[0]
+
+    suvisiace_predmety = set.union(podm_predmety, vyluc_predmety)
+    for predmet_id in suvisiace_predmety:
+      cur.execute('''INSERT INTO infolist_verzia_suvisiace_predmety
+        (infolist_verzia, predmet) VALUES (%s, %s)''',
+        (infolist_verzia_id, predmet_id))
+
+    for preklad in preklady_values(d):
+        cur.execute('''INSERT INTO infolist_verzia_preklad
+                (infolist_verzia, jazyk_prekladu, nazov_predmetu, podm_absol_priebezne,
+                podm_absol_skuska, vysledky_vzdelavania,
+                strucna_osnova) VALUES (%s, %s, %s, %s, %s, %s, %s)''',
+                (infolist_verzia_id,) + preklad)
+
+    if vyucujuci is None:
+        vyucujuci = vyucujuci_values(d, resolver.najdi_osoby)
+    vyucujuci_rows, typy = vyucujuci
+    for poradie, vyucujuci_id in vyucujuci_rows:
+        cur.execute('''INSERT INTO infolist_verzia_vyucujuci
+                (infolist_verzia, poradie, osoba)
+                VALUES (%s, %s, %s)
+                ''',
+                (infolist_verzia_id, poradie, vyucujuci_id))
+    for vyucujuci_id, typ in typy:
+        cur.execute('''INSERT INTO infolist_verzia_vyucujuci_typ
+                (infolist_verzia, osoba, typ_vyucujuceho)
+                VALUES (%s, %s, %s)''',
+                (infolist_verzia_id, vyucujuci_id, typ))
+
+    for sposob in d.sposoby:
+        cur.execute('''INSERT INTO infolist_verzia_cinnosti
+        (infolist_verzia, metoda_vyucby, druh_cinnosti,
+        pocet_hodin, za_obdobie) VALUES (%s, %s, %s, %s, %s)''',
+        (
+            infolist_verzia_id,
+            d.metodaStudia,
+            sposob.sposobVyucby,
+            sposob.rozsahHodin,
+            sposob.rozsahZaObdobie
+        ))
+
+    cur.execute('''INSERT INTO infolist_verzia_literatura
+      (infolist_verzia, bib_id, poradie)
+      SELECT %s, bib_id, row_number() over (ORDER BY bib_id)
+      FROM literatura_pre_import_predmetov
+      WHERE kod_predmetu = %s''',
+      (infolist_verzia_id, d.skratka))
+    return infolist_verzia_id
+
+def import2db(con, data, user, iba_kody=None, dry_run=False, resolver=None, davky=None,
+              aktualizuj=False):
+    """ import do cistej db
+
+    S aktualizuj sa infolisty predmetov, ktore uz infolist maju, porovnaju
+    s jeho poslednou verziou (vid aktualizuj_infolist) namiesto preskocenia.
+    """
+    if resolver is None:
+      resolver = Resolver(con)
+    if davky is None:
+      davky = Davkovanie(con, resolver)
     with closing(con.cursor()) as cur:
+        preskoc = Filter(resolver.importovane, iba_kody, aktualizuj=aktualizuj)
+        if aktualizuj:
+            data = list(data)
+            with faza('porovnanie'):
+                stare = nacitaj_posledne_verzie(cur,
+                  [d.kod for d in data if d.kod in resolver.importovane])
+                literatura = nacitaj_literaturu(cur, [d.skratka for d in data if d.kod in stare])
         for d in data:
-            if iba_kody != None:
-              if not iba_kody.match(d['kod']):
-                warn(u'Preskakujem import infolistu pre predmet {}, lebo nematchuje regex'.format(d['kod']))
-                continue
             # checkni duplikaty
-            cur.execute('''
-              SELECT 1
-              FROM predmet p
-              WHERE kod_predmetu=%s
-              AND EXISTS (
-                SELECT infolist
-                FROM predmet_infolist pi
-                WHERE pi.predmet = p.id
-              )
-              ''',
-              (d['kod'],))
-            is_duplicate = cur.fetchone() != None
-            if is_duplicate:
-                warn(u"Infolist pre predmet %s uz existuje" % d['kod'])
+            dovod = preskoc(d.kod)
+            if dovod is None and aktualizuj and d.kod in resolver.importovane:
+                if d.kod in stare:
+                    with context(predmet=d.kod), faza('zapis', d.kod), davky.zaznam(d.kod):
+                        aktualizuj_infolist(cur, d, user, resolver, stare.pop(d.kod),
+                                            literatura.get(d.skratka, set()))
+                    davky.commit_ak_treba()
+                    continue
+                dovod = u"Infolist pre predmet %s uz existuje" % d.kod
+            if dovod is None and resolver.overuj and resolver.ma_infolist(d.kod):
+                dovod = u"Infolist pre predmet %s uz existuje" % d.kod
+            if dovod is not None:
+                info(dovod, 'preskakujem')
                 continue
-            warn('Vytvaram infolist pre predmet %s' % d['kod'])
+            info('Vytvaram infolist pre predmet %s' % d.kod, 'vytvaram')
 
-            hodnotenia = {}
-            for hodn in ['A', 'B', 'C', 'D', 'E', 'FX']:
-              if 'hodnoteniaPredmetu' in d and hodn in d['hodnoteniaPredmetu']:
-                hodnotenia[hodn] = d['hodnoteniaPredmetu'][hodn]['pocetHodnoteni']
-              else:
-                hodnotenia[hodn] = None
-            
-            def prepare_formula(tokens):
-              idform = []
-              referenced = set()
-              for token in tokens:
-                if token in ('(', ')', 'AND', 'OR', 'a', 'alebo'):
-                  idform.append(token)
-                else:
-                  token_id = vytvor_alebo_najdi_predmet(token)
-                  referenced.add(token_id)
-                  idform.append(str(token_id))
-              return idform, referenced
-            
-            podm_s_idckami, podm_predmety = prepare_formula(d['podmienujucePredmety'])
-            vyluc_s_idckami, vyluc_predmety = prepare_formula(d['vylucujucePredmety'])
+            with context(predmet=d.kod), faza('zapis', d.kod), davky.zaznam(d.kod):
+                infolist_verzia_id = zapis_verziu(cur, d, user, resolver)
+
+                cur.execute('''INSERT INTO infolist (posledna_verzia, import_z_aisu,
+                        zamknute, zamkol, povodny_kod_predmetu)
+                        VALUES (%s, %s, now(), %s, %s)
+                        RETURNING id''',
+                        (infolist_verzia_id, True, user, d.kod))
+                infolist_id = cur.fetchone()[0]
             
-            cur.execute('''INSERT INTO infolist_verzia (
-                podm_absol_percenta_skuska, hodnotenia_a_pocet,
-                hodnotenia_b_pocet, hodnotenia_c_pocet, hodnotenia_d_pocet,
-                hodnotenia_e_pocet, hodnotenia_fx_pocet, modifikovane,
-                modifikoval, hromadna_zmena,
-                pocet_kreditov, fakulta, podmienujuce_predmety,
-                odporucane_predmety, vylucujuce_predmety, potrebny_jazyk,
-                treba_zmenit_kod, predpokladany_semester) VALUES
-                (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s) RETURNING id''',
-                (
-                    d['vahaSkusky'],
-                    hodnotenia['A'],
-                    hodnotenia['B'],
-                    hodnotenia['C'],
-                    hodnotenia['D'],
-                    hodnotenia['E'],
-                    hodnotenia['FX'],
-                    datetime.datetime.strptime(d['datumSchvalenia'],"%d.%m.%Y"),
-                    user,
-                    True, # hromadna zmena
-                    d['kredit'],
-                    'FMFI',
-                    u' '.join(podm_s_idckami),
-                    '',
-                    u' '.join(vyluc_s_idckami),
-                    'sk_en',
-                    False,
-                    d['kodSemesterStudPlan']
-                ))
-            infolist_verzia_id = cur.fetchone()[0]
+                predmet_id = resolver.vytvor_alebo_najdi_predmet(d.kod, d.skratka)
             
-            suvisiace_predmety = set.union(podm_predmety, vyluc_predmety)
-            for predmet_id in suvisiace_predmety:
-              cur.execute('''INSERT INTO infolist_verzia_suvisiace_predmety
-                (infolist_verzia, predmet) VALUES (%s, %s)''',
-                (infolist_verzia_id, predmet_id))
-
-            #if d['_C_']:
-            #  vysledky_vzdelavania = u'''Tento obsah bol automaticky importovaný z položky "ciele predmetu", je potrebné ho zmeniť podľa požiadaviek na "výsledky vzdelávania"!\n\n'''
-            #  vysledky_vzdelavania += d['_C_']
-            #else:
-            #  vysledky_vzdelavania = ''
-
-            if d['_VV_']:
-              vysledky_vzdelavania = d['_VV_']
+                cur.execute('''INSERT INTO predmet_infolist(predmet, infolist)
+                               VALUES (%s, %s)''', (predmet_id, infolist_id))
+                resolver.importovane.add(d.kod)
+            davky.commit_ak_treba()
+
+def _copy_value(v):
+  if v is None:
+    return u'\\N'
+  if v is True:
+    return u't'
+  if v is False:
+    return u'f'
+  if isinstance(v, datetime.datetime):
+    return v.isoformat(' ')
+  if not isinstance(v, basestring):
+    return unicode(v)
+  return v.replace(u'\\', u'\\\\').replace(u'\t', u'\\t').replace(u'\n', u'\\n').replace(u'\r', u'\\r')
+
+def copy_rows(cur, table, columns, rows):
+  """Nakopiruje riadky do tabulky jednym prikazom COPY."""
+  buf = u''.join(u'\t'.join(_copy_value(v) for v in row) + u'\n' for row in rows)
+  encoding = psycopg2.extensions.encodings[cur.connection.encoding]
+  cur.copy_expert('COPY {} ({}) FROM STDIN'.format(table, ', '.join(columns)),
+    io.BytesIO(buf.encode(encoding)))
+
+# docasne tabulky pre import2db_copy: (nazov, stlpce pre COPY, SELECT, podla
+# ktoreho ma tabulka rovnake typy stlpcov ako ciel)
+staging_tables = (
+  ('stg_predmet', ('poradie', 'kod_predmetu', 'skratka'),
+    'SELECT id AS poradie, kod_predmetu, skratka FROM predmet'),
+  ('stg_verzia', ('id',) + verzia_columns,
+    'SELECT id, {} FROM infolist_verzia'.format(', '.join(verzia_columns))),
+  ('stg_suvisiace', ('infolist_verzia', 'predmet'),
+    'SELECT infolist_verzia, predmet FROM infolist_verzia_suvisiace_predmety'),
+  ('stg_preklad', ('infolist_verzia',) + preklad_columns,
+    'SELECT infolist_verzia, {} FROM infolist_verzia_preklad'.format(', '.join(preklad_columns))),
+  ('stg_vyucujuci', ('infolist_verzia', 'poradie', 'osoba'),
+    'SELECT infolist_verzia, poradie, osoba FROM infolist_verzia_vyucujuci'),
+  ('stg_vyucujuci_typ', ('infolist_verzia', 'osoba', 'typ_vyucujuceho'),
+    'SELECT infolist_verzia, osoba, typ_vyucujuceho FROM infolist_verzia_vyucujuci_typ'),
+  ('stg_cinnosti', ('infolist_verzia', 'metoda_vyucby', 'druh_cinnosti', 'pocet_hodin', 'za_obdobie'),
+    'SELECT infolist_verzia, metoda_vyucby, druh_cinnosti, pocet_hodin, za_obdobie FROM infolist_verzia_cinnosti'),
+  ('stg_literatura', ('infolist_verzia', 'kod_predmetu'),
+    'SELECT v.infolist_verzia, l.kod_predmetu FROM infolist_verzia_literatura v, literatura_pre_import_predmetov l'),
+  ('stg_infolist', ('id', 'posledna_verzia', 'zamkol', 'povodny_kod_predmetu'),
+    'SELECT id, posledna_verzia, zamkol, povodny_kod_predmetu FROM infolist'),
+  ('stg_predmet_infolist', ('predmet', 'infolist'),
+    'SELECT predmet, infolist FROM predmet_infolist'),
+)
+
+def import2db_copy(con, data, user, iba_kody=None, dry_run=False, resolver=None, davky=None,
+                   aktualizuj=False):
+    """ import do cistej db cez docasne tabulky naplnene cez COPY
+
+    Vysledok je rovnaky ako pri import2db, pocet dotazov vsak nezavisi od
+    poctu predmetov. Cely subor sa zapisuje naraz, takze commit_every
+    (savepoint pre kazdy infolist) ani aktualizuj nie su podporovane.
+    """
+    if davky is not None and davky.commit_every:
+      raise ValueError('import2db_copy nepodporuje commit_every')
+    if aktualizuj:
+      raise ValueError('import2db_copy nepodporuje aktualizuj')
+    if resolver is None:
+      resolver = Resolver(con)
+    data = list(data)
+    with closing(con.cursor()) as cur:
+        preskoc = Filter(resolver.importovane, iba_kody)
+        zaznamy = []
+        for d in data:
+            # checkni duplikaty
+            dovod = preskoc(d.kod)
+            if dovod is not None:
+                info(dovod, 'preskakujem')
+                continue
+            resolver.importovane.add(d.kod)
+            info('Vytvaram infolist pre predmet %s' % d.kod, 'vytvaram')
+            zaznamy.append(d)
+        if not zaznamy:
+            return
+
+        # predmety v poradi, v akom by ich vytvaral import2db
+        skratky = {}
+        poradie_predmetov = []
+        for d in zaznamy:
+            for kod in d.podmienujucePredmety.kody + d.vylucujucePredmety.kody:
+                if kod not in skratky:
+                    skratky[kod] = None
+                    poradie_predmetov.append(kod)
+            if d.kod not in skratky:
+                skratky[d.kod] = d.skratka
+                poradie_predmetov.append(d.kod)
+
+        predmety = resolver.predmety
+
+        cur.execute('''SELECT nextval(pg_get_serial_sequence('infolist_verzia', 'id')),
+                              nextval(pg_get_serial_sequence('infolist', 'id'))
+                       FROM generate_series(1, %s)''', (len(zaznamy),))
+        ids = cur.fetchall()
+        verzia_ids = sorted(row[0] for row in ids)
+        infolist_ids = sorted(row[1] for row in ids)
+
+        cur.execute(u'\n'.join(
+          u'CREATE TEMP TABLE {} AS {} WITH NO DATA;'.format(name, select)
+          for name, columns, select in staging_tables))
+
+        nove_predmety = []
+        for kod_predmetu in poradie_predmetov:
+            if kod_predmetu not in predmety:
+                skratka = skratky[kod_predmetu]
+                if skratka == None:
+                    skratka = kod2skratka(kod_predmetu)
+                nove_predmety.append((len(nove_predmety), kod_predmetu, skratka))
+        if nove_predmety:
+            copy_rows(cur, 'stg_predmet', ('poradie', 'kod_predmetu', 'skratka'), nove_predmety)
+            cur.execute('''INSERT INTO predmet (kod_predmetu, skratka,
+                             povodny_kod, povodna_skratka)
+                           SELECT kod_predmetu, skratka, kod_predmetu, skratka
+                           FROM stg_predmet ORDER BY poradie
+                           RETURNING kod_predmetu, id''')
+            predmety.update(cur.fetchall())
+
+        najdi_predmet = predmety.__getitem__
+        rows = dict((name, []) for name, columns, select in staging_tables)
+        for d, infolist_verzia_id, infolist_id in zip(zaznamy, verzia_ids, infolist_ids):
+            with context(predmet=d.kod):
+                podm_s_idckami, podm_predmety = d.podmienujucePredmety.s_idckami(najdi_predmet)
+                vyluc_s_idckami, vyluc_predmety = d.vylucujucePredmety.s_idckami(najdi_predmet)
+                rows['stg_verzia'].append((infolist_verzia_id,) +
+                  verzia_values(d, user, podm_s_idckami, vyluc_s_idckami))
+                for predmet_id in set.union(podm_predmety, vyluc_predmety):
+                    rows['stg_suvisiace'].append((infolist_verzia_id, predmet_id))
+                rows['stg_preklad'].extend((infolist_verzia_id,) + preklad
+                                           for preklad in preklady_values(d))
+                vyucujuci_rows, typy = vyucujuci_values(d, resolver.najdi_osoby)
+                for poradie, vyucujuci_id in vyucujuci_rows:
+                    rows['stg_vyucujuci'].append((infolist_verzia_id, poradie, vyucujuci_id))
+                for vyucujuci_id, typ in typy:
+                    rows['stg_vyucujuci_typ'].append((infolist_verzia_id, vyucujuci_id, typ))
+                for sposob in d.sposoby:
+                    rows['stg_cinnosti'].append((infolist_verzia_id, d.metodaStudia,
+                      sposob.sposobVyucby, sposob.rozsahHodin, sposob.rozsahZaObdobie))
+                rows['stg_literatura'].append((infolist_verzia_id, d.skratka))
+                rows['stg_infolist'].append((infolist_id, infolist_verzia_id, user, d.kod))
+                rows['stg_predmet_infolist'].append((predmety[d.kod], infolist_id))
+
+        for name, columns, select in staging_tables:
+            if rows[name]:
+                copy_rows(cur, name, columns, rows[name])
+
+        cur.execute('''
+          INSERT INTO infolist_verzia (id, {0})
+            SELECT id, {0} FROM stg_verzia ORDER BY id;
+          INSERT INTO infolist_verzia_suvisiace_predmety (infolist_verzia, predmet)
+            SELECT infolist_verzia, predmet FROM stg_suvisiace;
+          INSERT INTO infolist_verzia_preklad (infolist_verzia, {1})
+            SELECT infolist_verzia, {1} FROM stg_preklad;
+          INSERT INTO infolist_verzia_vyucujuci (infolist_verzia, poradie, osoba)
+            SELECT infolist_verzia, poradie, osoba FROM stg_vyucujuci;
+          INSERT INTO infolist_verzia_vyucujuci_typ (infolist_verzia, osoba, typ_vyucujuceho)
+            SELECT infolist_verzia, osoba, typ_vyucujuceho FROM stg_vyucujuci_typ;
+          INSERT INTO infolist_verzia_cinnosti (infolist_verzia, metoda_vyucby,
+              druh_cinnosti, pocet_hodin, za_obdobie)
+            SELECT infolist_verzia, metoda_vyucby, druh_cinnosti, pocet_hodin, za_obdobie
+            FROM stg_cinnosti;
+          INSERT INTO infolist_verzia_literatura (infolist_verzia, bib_id, poradie)
+            SELECT s.infolist_verzia, l.bib_id,
+              row_number() over (PARTITION BY s.infolist_verzia ORDER BY l.bib_id)
+            FROM stg_literatura s
+            JOIN literatura_pre_import_predmetov l ON l.kod_predmetu = s.kod_predmetu;
+          INSERT INTO infolist (id, posledna_verzia, import_z_aisu, zamknute, zamkol,
+              povodny_kod_predmetu)
+            SELECT id, posledna_verzia, true, now(), zamkol, povodny_kod_predmetu
+            FROM stg_infolist ORDER BY id;
+          INSERT INTO predmet_infolist (predmet, infolist)
+            SELECT predmet, infolist FROM stg_predmet_infolist;
+          DROP TABLE {2};
+          '''.format(', '.join(verzia_columns), ', '.join(preklad_columns),
+            ', '.join(name for name, columns, select in staging_tables)))
+
+engines = {'riadky': import2db, 'copy': import2db_copy}
+
+def rozdel_podla_predmetov(zaznamy, pocet, predmety):
+  """Rozdeli zaznamy (dvojice (subor, infolist)) do najviac pocet skupin.
+
+  Infolisty s rovnakym kodom a infolisty, ktore odkazuju na ten isty este
+  neexistujuci predmet (nie je v predmety), musia byt v tej istej skupine,
+  lebo predmet vytvori a uvidi iba jedna transakcia. Suvisle komponenty
+  (union-find) sa od najvacsich rozdelia do najmenej zaplnenych skupin,
+  v skupine ostane poradie zo zaznamy.
+  """
+  rodic = {}
+  def najdi(kod):
+    while rodic.setdefault(kod, kod) != kod:
+      rodic[kod] = rodic[rodic[kod]]
+      kod = rodic[kod]
+    return kod
+  for f, d in zaznamy:
+    for kod in d.podmienujucePredmety.kody + d.vylucujucePredmety.kody:
+      if kod not in predmety:
+        a, b = najdi(d.kod), najdi(kod)
+        if a != b:
+          rodic[b] = a
+  komponenty = {}
+  for i, (f, d) in enumerate(zaznamy):
+    komponenty.setdefault(najdi(d.kod), []).append(i)
+  skupiny = [[] for _ in range(pocet)]
+  for komponent in sorted(komponenty.values(), key=len, reverse=True):
+    min(skupiny, key=len).extend(komponent)
+  return [[zaznamy[i] for i in sorted(skupina)] for skupina in skupiny if skupina]
+
+def _zastavitelne(zaznamy, stop):
+  for f, d in zaznamy:
+    if stop.is_set():
+      raise _Zastavene()
+    yield d
+
+def _db_worker(spojenie, stop, conn_str, zaznamy, user, resolver, iba_kody, gid, profiluj):
+  """Zapise skupinu infolistov vlastnym spojenim (pri --db-workers).
+
+  Ak je zadany gid, zapisuje sa v dvojfazovej transakcii, ktora sa po zapise
+  pripravi (PREPARE TRANSACTION). Potom posle ('pripraveny', diagnostika,
+  importovane) alebo ('chyba', diagnostika, traceback), pocka na 'commit'
+  alebo 'rollback' a nakoniec posle ('hotovo', diagnostika, traceback, profil).
+  """
+  global _warn_sink, _profil
+  _warn_sink = []
+  _profil = Profil() if profiluj else None
+  del _context[:]
+  pred = set(resolver.importovane)
+  con = None
+  try:
+    con = psycopg2.connect(conn_str, cursor_factory=ProfilovanyKurzor)
+    if gid is not None:
+      con.tpc_begin(gid)
+    resolver.prepoj(con)
+    for f, skupina in itertools.groupby(zaznamy, key=lambda x: x[0]):
+      with context(subor=os.path.basename(f)):
+        import2db(con, _zastavitelne(skupina, stop), user, iba_kody=iba_kody,
+                  resolver=resolver)
+    if gid is not None:
+      with faza('commit'):
+        con.tpc_prepare()
+    sprava = ('pripraveny', _warn_sink, list(resolver.importovane - pred))
+  except _Zastavene:
+    sprava = ('zastaveny', [z for z in _warn_sink if z[1] != 'vynimka'], None)
+  except Exception:
+    sprava = ('chyba', _warn_sink, traceback.format_exc())
+  _warn_sink = []
+  spojenie.send(sprava)
+  rozhodnutie = spojenie.recv()
+  tb = None
+  try:
+    if con is not None:
+      with faza('commit'):
+        if gid is None:
+          if rozhodnutie == 'commit':
+            con.commit()
+          else:
+            con.rollback()
+        elif rozhodnutie == 'commit':
+          con.tpc_commit()
+        else:
+          con.tpc_rollback()
+  except Exception:
+    tb = traceback.format_exc()
+  finally:
+    if con is not None:
+      con.close()
+  spojenie.send(('hotovo', _warn_sink, tb, _profil.data() if _profil is not None else None))
+
+# kluc advisory zamku, ktory drzi import s --db-workers pocas celeho zapisu
+ZAMOK_DB_WORKERS = 0x1f0
+
+def zapis_paralelne(conn_str, zaznamy, user, resolver, pocet, iba_kody=None, dry_run=False):
+  """Zapise zaznamy (dvojice (subor, infolist)) v pocet procesoch, kazdy
+  s vlastnym spojenim do DB a vlastnou transakciou.
+
+  Commit je koordinovany: transakcie sa commitnu az ked vsetky procesy
+  zapisali svoje infolisty bez chyby; pri chybe v niektorom sa ostatne
+  zastavia a vsetky transakcie sa vratia spat, rovnako pri dry_run. Ak to
+  server dovoli (max_prepared_transactions), transakcie sa pred commitom
+  pripravia (PREPARE TRANSACTION), takze sa commitnu bud vsetky, alebo
+  ziadna. Inak sa commituju po jednej a chyba pri commite moze nechat
+  import ciastocny.
+
+  Pocas celeho zapisu sa drzi advisory zamok ZAMOK_DB_WORKERS, takze dva
+  importy s --db-workers zapisuju jeden po druhom. Zamky na jednotlive
+  predmety by nestacili: procesy jedneho importu cakaju na seba navzajom
+  mimo DB, takze by sa dva importy mohli zablokovat bez toho, aby to
+  PostgreSQL zistil.
+  """
+  skupiny = rozdel_podla_predmetov(zaznamy, pocet, resolver.predmety)
+  stop = multiprocessing.Event()
+  procesy = []
+  gids = []
+  rozhodnutie = None
+  with closing(psycopg2.connect(conn_str)) as zamok:
+    zamok.autocommit = True
+    with closing(zamok.cursor()) as cur:
+      cur.execute('SELECT pg_try_advisory_lock(%s)', (ZAMOK_DB_WORKERS,))
+      if not cur.fetchone()[0]:
+        info(u'Cakam, kym skonci iny import s --db-workers', 'db-workers')
+        with faza('cakanie'):
+          cur.execute('SELECT pg_advisory_lock(%s)', (ZAMOK_DB_WORKERS,))
+      cur.execute("SELECT current_setting('max_prepared_transactions')::int")
+      if cur.fetchone()[0] >= len(skupiny):
+        predpona = 'infolist-import-{}'.format(uuid.uuid4().hex)
+        gids = ['{}-{}'.format(predpona, i) for i in range(len(skupiny))]
+      else:
+        warn(u'Server nema zapnute max_prepared_transactions (treba aspon {}), '
+             u'commit procesov nebude atomicky'.format(len(skupiny)), 'db-workers')
+      try:
+        for i, skupina in enumerate(skupiny):
+          rodic, dieta = multiprocessing.Pipe()
+          proces = multiprocessing.Process(target=_db_worker, args=(dieta, stop, conn_str,
+            skupina, user, resolver, iba_kody, gids[i] if gids else None, _profil is not None))
+          proces.start()
+          procesy.append((proces, rodic))
+        chyby = []
+        cakaju = list(procesy)
+        with faza('cakanie'):
+          while cakaju:
+            for proces, rodic in list(cakaju):
+              if not rodic.poll(0.05):
+                if not proces.is_alive() and not rodic.poll():
+                  raise RuntimeError('Proces zapisujuci do DB neocakavane skoncil')
+                continue
+              cakaju.remove((proces, rodic))
+              typ, diagnostika, x = rodic.recv()
+              for z in diagnostika:
+                emit(z)
+              if typ == 'pripraveny':
+                resolver.importovane.update(x)
+              elif typ == 'chyba':
+                stop.set()
+                chyby.append(x)
+        rozhodnutie = 'rollback' if chyby or dry_run else 'commit'
+        for proces, rodic in procesy:
+          rodic.send(rozhodnutie)
+        for proces, rodic in procesy:
+          typ, diagnostika, tb, profil = rodic.recv()
+          for z in diagnostika:
+            emit(z)
+          if profil is not None:
+            _profil.zluc(profil)
+          if tb is not None:
+            chyby.append(tb)
+          proces.join()
+      finally:
+        stop.set()
+        for proces, rodic in procesy:
+          if proces.is_alive():
+            proces.terminate()
+            proces.join()
+        if gids:
+          # pripravene transakcie procesov, ktore ich nestihli dokoncit
+          cur.execute('SELECT gid FROM pg_prepared_xacts WHERE gid = ANY(%s)', (gids,))
+          for gid, in cur.fetchall():
+            if rozhodnutie == 'commit':
+              cur.execute('COMMIT PREPARED %s', (gid,))
             else:
-              vysledky_vzdelavania = ''
-
-            cur.execute('''INSERT INTO infolist_verzia_preklad
-                    (infolist_verzia, jazyk_prekladu, nazov_predmetu, podm_absol_priebezne,
-                    podm_absol_skuska, vysledky_vzdelavania,
-                    strucna_osnova) VALUES (%s, %s, %s, %s, %s, %s, %s)''',
-                    (
-                     infolist_verzia_id,
-                     "sk",
-                     d['nazov'],
-                     d['_P_'],
-                     d['_Z_'],
-                     vysledky_vzdelavania,
-                     d['_SO_'],
-                    ))
-
-            poradie = 1
-            vlozeny = set()
-            for vyucujuci in d['vyucujuciAll']:
-                cur.execute('SELECT id FROM osoba WHERE cele_meno=%s',
-                        (vyucujuci['plneMeno'], ))
-                ids = cur.fetchall()
-                if len(ids) > 1:
-                    warn(u"Nasiel som duplikovany zaznam pre vyucujuceho %s na predmete %s"
-                            % (vyucujuci['plneMeno'], d['kod']))
-                    continue
-                elif len(ids) == 0:
-                    warn(u"Nenasiel som ziadny zaznam pre vyucujuceho %s na predmete %s"
-                            % (vyucujuci['plneMeno'], d['kod']))
-                    continue
+              cur.execute('ROLLBACK PREPARED %s', (gid,))
+  if chyby:
+    _diagnostika.flush()
+    for tb in chyby:
+      sys.stderr.write(tb)
+    if rozhodnutie != 'commit':
+      raise RuntimeError('Zapis do DB zlyhal, vsetky zmeny sa vratili spat')
+    if not gids:
+      raise RuntimeError('Commit zlyhal iba v niektorych procesoch, import je ciastocny')
+    warn(u'Commit niektorych pripravenych transakcii dokoncil hlavny proces', 'db-workers')
 
-                vyucujuci_id = ids[0]
-                
-                if vyucujuci_id not in vlozeny:
-                    cur.execute('''INSERT INTO infolist_verzia_vyucujuci
-                            (infolist_verzia, poradie, osoba)
-                            VALUES (%s, %s, %s)
-                            ''',
-                            (infolist_verzia_id, poradie, vyucujuci_id))
-                    vlozeny.add(vyucujuci_id)
-                    poradie += 1
-
-                # zabranit potencialnym duplikatom    
-                cur.execute('''DELETE FROM infolist_verzia_vyucujuci_typ where
-                        infolist_verzia=%s and osoba=%s 
-                        and typ_vyucujuceho=%s''',
-                        (infolist_verzia_id, vyucujuci_id, vyucujuci['typ']))
-    
-                cur.execute('''INSERT INTO infolist_verzia_vyucujuci_typ
-                        (infolist_verzia, osoba, typ_vyucujuceho)
-                        VALUES (%s, %s, %s)''',
-                        (infolist_verzia_id, vyucujuci_id, vyucujuci['typ']))
-
-            for sposob in d['sposoby']:
-                cur.execute('''INSERT INTO infolist_verzia_cinnosti
-                (infolist_verzia, metoda_vyucby, druh_cinnosti,
-                pocet_hodin, za_obdobie) VALUES (%s, %s, %s, %s, %s)''',
-                (
-                    infolist_verzia_id,
-                    d['metodaStudia'],
-                    sposob['sposobVyucby'],
-                    sposob['rozsahHodin'],
-                    sposob['rozsahZaObdobie']
-                ))
-            
-            cur.execute('''INSERT INTO infolist_verzia_literatura
-              (infolist_verzia, bib_id, poradie)
-              SELECT %s, bib_id, row_number() over ()
-              FROM literatura_pre_import_predmetov
-              WHERE kod_predmetu = %s''',
-              (infolist_verzia_id, d['skratka']))
-
-            cur.execute('''INSERT INTO infolist (posledna_verzia, import_z_aisu,
-                    zamknute, zamkol, povodny_kod_predmetu)
-                    VALUES (%s, %s, now(), %s, %s)
-                    RETURNING id''',
-                    (infolist_verzia_id, True, user, d['kod']))
-            infolist_id = cur.fetchone()[0]
-            
-            predmet_id = vytvor_alebo_najdi_predmet(d['kod'], d['skratka'])
-            
-            cur.execute('''INSERT INTO predmet_infolist(predmet, infolist)
-                           VALUES (%s, %s)''', (predmet_id, infolist_id))
+def _s_prekladmi(data, preklady):
+  """Priradi infolistom preklady; pouzite sa zo slovnika preklady vyberu."""
+  for d in data:
+    d.preklady = preklady.pop(d.kod, None)
+    yield d
 
-def main(filenames, user, iba_kody=None, lang='sk', dry_run=False):
+def _do_manifestu(manifest, videne, resolver, f, h, zaznamy):
+  """Zaznamena do manifestu importovane infolisty zo suboru f.
+
+  Subor sa zaznamena (a dalsi import ho cely preskoci) iba ak su v DB
+  vsetky jeho infolisty a ziadna zmena neostala nezapisana. Inak (--iba-kody,
+  chyba pri --commit-every, zmeneny infolist bez --update, ...) sa subor
+  nabuduce parsuje znova a infolisty sa s manifestom porovnaju kazdy zvlast.
+  Ak subor obsahoval infolisty, ktore uz v DB boli a neporovnali sa, zaznamena
+  sa ako 'existoval' a --update ho nepreskoci.
+  """
+  zapisane = set(kod for kod, hash_zaznamu in zaznamy if kod in resolver.importovane)
+  cely = True
+  overeny = True
+  for kod, hash_zaznamu, stav in videne:
+    if stav is None or kod not in resolver.importovane:
+      cely = False
+    elif kod not in zapisane:
+      if stav == 'zmeneny': # zmenu tento import nezapisal
+        cely = False
+      elif stav == 'novy': # infolisty, ktore uz boli v DB pred prvym pouzitim manifestu
+        manifest.zaznamenaj_zaznam(kod, hash_zaznamu, 'existoval')
+      overeny = overeny and manifest.overeny_zaznam(kod)
+  for kod, hash_zaznamu in zaznamy:
+    if kod in resolver.importovane:
+      manifest.zaznamenaj_zaznam(kod, hash_zaznamu)
+    else:
+      cely = False
+  if cely:
+    manifest.zaznamenaj_subor(f, h, 'spracovany' if overeny else 'existoval')
+
+def _sleduj(data, zoznam):
+  for d in data:
+    zoznam.append((d.kod, d.hash))
+    yield d
+
+def _validuj_subor(args):
+  """Skontroluje jeden subor, vrati (pocet infolistov, problemy)."""
+  global _warn_sink, _problemy
+  filename, kwargs = args
+  _warn_sink = []
+  _problemy = []
+  _context[:] = [{'subor': os.path.basename(filename)}]
+  pocet = 0
+  try:
+    if os.stat(filename).st_size == 0:
+      problem('subor', u'Prazdny subor', uroven='varovanie')
+    else:
+      for d in iter_file(filename, **kwargs):
+        pocet += 1
+  except Exception as e:
+    problem('subor', _popis_chyby(e))
+  finally:
+    problemy = _problemy
+    _warn_sink = None
+    _problemy = None
+    del _context[:]
+  return pocet, problemy
+
+def validate(filenames, jobs=1, iba_kody=None, lang='sk', vsetky_polia=False):
+  """Sparsuje a skontroluje subory bez pripojenia k DB.
+
+  Chyby, pre ktore by import skoncil, aj upozornenia sa zbieraju do reportu
+  (dict), kontroluje sa vsetko az do konca.
+  """
+  kwargs = dict(lang=lang, vsetky_polia=vsetky_polia, preskoc=Filter(iba_kody=iba_kody))
+  ulohy = [(f, kwargs) for f in filenames]
+  if jobs > 1 and len(ulohy) > 1:
+    pool = multiprocessing.Pool(jobs)
+    try:
+      vysledky = pool.map(_validuj_subor, ulohy)
+    finally:
+      pool.terminate()
+  else:
+    vysledky = map(_validuj_subor, ulohy)
+  problemy = [p for pocet, pp in vysledky for p in pp]
+  podla_druhu = {}
+  for p in problemy:
+    podla_druhu[p['druh']] = podla_druhu.get(p['druh'], 0) + 1
+  return {
+    'subory': len(filenames),
+    'infolisty': sum(pocet for pocet, pp in vysledky),
+    'chyby': sum(1 for p in problemy if p['uroven'] == 'chyba'),
+    'varovania': sum(1 for p in problemy if p['uroven'] == 'varovanie'),
+    'podla_druhu': podla_druhu,
+    'problemy': problemy,
+  }
+
+def main(filenames, user, profile=None, diagnostika=None, uroven='info', **kwargs):
+    global _profil, _diagnostika
+    if profile is not None:
+      _profil = Profil()
+    if diagnostika is None:
+      _diagnostika = Diagnostika(uroven=uroven)
+    elif diagnostika == '-':
+      _diagnostika = Diagnostika(uroven=uroven, jsonl=True)
+    else:
+      _diagnostika = Diagnostika(open(diagnostika, 'w'), uroven=uroven, jsonl=True)
+    try:
+      return _main(filenames, user, **kwargs)
+    finally:
+      _diagnostika.vypis_suhrn(sys.stderr)
+      if _diagnostika.f is not None:
+        _diagnostika.f.close()
+      if _profil is not None:
+        if profile == '-':
+          _profil.vypis(sys.stderr)
+        else:
+          with open(profile, 'w') as f:
+            json.dump(_profil.suhrn(), f, indent=1, sort_keys=True)
+        _profil = None
+
+def _main(filenames, user, iba_kody=None, lang='sk', dry_run=False, jobs=1,
+          engine='riadky', manifest=None, vsetky_polia=False, commit_every=None,
+          checkpoint=None, cache=None, pipeline=0, preklady=(), db_workers=0,
+          aktualizuj=False):
     with open(os.path.expanduser('~/.akreditacia.conn'), 'r') as f:
       conn_str = f.read()
-    with closing(psycopg2.connect(conn_str)) as con:
+    with closing(psycopg2.connect(conn_str, cursor_factory=ProfilovanyKurzor)) as con:
         with con.cursor() as cur:
           cur.execute('SELECT id FROM osoba WHERE login = %s', (user,))
           row = cur.fetchone()
           if row == None:
             raise ValueError('Pouzivatel s loginom {} neexistuje'.format(user))
           user = row[0]
-        for f in filenames:
-            with context(subor=os.path.basename(f)):
-                si = os.stat(f)
-                if si.st_size == 0:
-                  warn('Prekakujem prazdny subor {}'.format(os.path.basename(f)))
-                  continue
-                data = process_file(f, lang=lang)
-                import2db(con, data, user, iba_kody=iba_kody, dry_run=dry_run)
+        with faza('resolver'):
+          resolver = Resolver(con)
+        preskoc = Filter(resolver.importovane, iba_kody, manifest=manifest,
+                         checkpoint=checkpoint, aktualizuj=aktualizuj)
+        davky = Davkovanie(con, resolver, commit_every=commit_every, dry_run=dry_run,
+                           checkpoint=checkpoint)
+        if checkpoint is not None:
+          zostava = []
+          for f in filenames:
+            if checkpoint.je_hotovy(f):
+              with context(subor=os.path.basename(f)):
+                info(u'Preskakujem subor {}, podla checkpointu uz je importovany'.format(
+                  os.path.basename(f)), 'preskakujem')
+            else:
+              zostava.append(f)
+          filenames = zostava
+        hashe = {}
+        if manifest is not None:
+          vybrane = []
+          for f in filenames:
+            with context(subor=os.path.basename(f)), faza('hash'):
+              hashe[f] = file_hash(f)
+              stav = manifest.stav_suboru(f, hashe[f])
+              if stav == 'nezmeneny' and (not aktualizuj or manifest.overeny_subor(f)):
+                info(u'Preskakujem nezmeneny subor {}'.format(os.path.basename(f)), 'preskakujem')
+                continue
+              info(u'Subor {} je {}'.format(os.path.basename(f), stav), 'manifest')
+              vybrane.append(f)
+          filenames = vybrane
+        if preklady:
+          preklady = nacitaj_preklady(preklady, jobs=jobs, cache=cache, iba_kody=iba_kody,
+                                      importovane=resolver.importovane, aktualizuj=aktualizuj)
+        parsovanie = dict(jobs=jobs, cache=cache, lang=lang, preskoc=preskoc,
+                          hashuj=manifest is not None, vsetky_polia=vsetky_polia)
+        if pipeline:
+          subory = parse_files_pipeline(filenames, pipeline, **parsovanie)
+        else:
+          subory = parse_files(filenames, **parsovanie)
+        # pri --db-workers sa infolisty najprv pozbieraju a zapisu sa naraz
+        na_zapis = []
+        odlozene = []
+        # pri chybe treba parser hned zastavit (finally v parse_files*)
+        with closing(subory):
+          for f, data in subory:
+              with context(subor=os.path.basename(f)):
+                  zaznamy = []
+                  if preklady:
+                    data = _s_prekladmi(data, preklady)
+                  if manifest is not None:
+                    data = _sleduj(data, zaznamy)
+                  if db_workers > 1:
+                    na_zapis.extend((f, d) for d in data)
+                    odlozene.append((f, zaznamy, list(preskoc.videne)))
+                    del preskoc.videne[:]
+                    continue
+                  with faza('zapis'):
+                    engines[engine](con, data, user, iba_kody=iba_kody, dry_run=dry_run,
+                      resolver=resolver, davky=davky, aktualizuj=aktualizuj)
+                  if manifest is not None:
+                    _do_manifestu(manifest, preskoc.videne, resolver, f, hashe[f], zaznamy)
+                    del preskoc.videne[:]
+                  davky.subor_hotovy(f)
+        if db_workers > 1:
+          with faza('zapis'):
+            zapis_paralelne(conn_str, na_zapis, user, resolver, db_workers,
+                            iba_kody=iba_kody, dry_run=dry_run)
+          for f, zaznamy, videne in odlozene:
+            if manifest is not None:
+              _do_manifestu(manifest, videne, resolver, f, hashe[f], zaznamy)
+        for kod in sorted(preklady):
+          if kod not in resolver.importovane:
+            warn(u'Preklad ({}) pre predmet {} nema infolist v jazyku {}'.format(
+              u', '.join(p.lang for p in preklady[kod]), kod, lang), 'preklad')
+        if davky.chybne:
+          warn(u'Nepodarilo sa importovat {} infolistov: {}'.format(len(davky.chybne),
+            u', '.join(sorted(davky.chybne))), 'import', uroven='chyba')
         if not dry_run:
-          con.commit()
-    if not dry_run:
+          davky.commit()
+          if manifest is not None:
+            manifest.save()
+          # pri chybach checkpoint ostane, je v nom zoznam chybnych infolistov
+          if checkpoint is not None and not davky.chybne:
+            checkpoint.zmaz()
+    if davky.chybne:
+      print("Hotovo, ale {} infolistov sa nepodarilo importovat.".format(len(davky.chybne)))
+    elif not dry_run:
       print("Hotovo.")
     else:
       print("Hotovo. Kedze --dry-run, tak necommitujeme...")
+    return 1 if davky.chybne else 0
 
 
 if __name__ == "__main__":
@@ -495,18 +2393,90 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Coverts AIS XMLs into HTMLs.')
     parser.add_argument('input_path', metavar='input-path', help='path to input XMLs')
     parser.add_argument('--lang', dest='lang', nargs='?', default='sk', help='language')
+    parser.add_argument('--preklad', dest='preklad', metavar='JAZYK=ADRESAR', action='append',
+      default=[], help='pridaj preklady z exportu v inom jazyku (parovanie podla kodu predmetu)')
     parser.add_argument('--iba-kody', dest='iba_kody', metavar='kod',
       help='importujme iba IL pre predmety s kodom matchujucim tento regularny vyraz')
-    parser.add_argument('user', help='user who makes the changes')
+    parser.add_argument('user', nargs='?', help='user who makes the changes')
     parser.add_argument('--dry-run', help='do not commit the changes into DB', action='store_true')
+    parser.add_argument('--jobs', dest='jobs', metavar='N', type=int, default=1,
+      help='pocet procesov, v ktorych sa paralelne parsuju XML subory')
+    parser.add_argument('--engine', dest='engine', choices=sorted(engines), default='riadky',
+      help='sposob zapisu do DB: riadky = po jednom riadku, copy = cez docasne tabulky a COPY')
+    parser.add_argument('--manifest', dest='manifest', metavar='SUBOR',
+      help='JSON subor s hashmi uz importovanych suborov a infolistov; nezmenene sa preskocia')
+    parser.add_argument('--vsetky-polia', dest='vsetky_polia', action='store_true',
+      help='parsuj aj elementy, ktore sa do DB nezapisuju (_O_, _S_, obdobie, ...)')
+    parser.add_argument('--profile', dest='profile', metavar='SUBOR', nargs='?', const='-',
+      help='zmeraj casy faz a SQL dotazov; suhrn sa vypise na stderr, alebo ako JSON do SUBORu')
+    parser.add_argument('--commit-every', dest='commit_every', metavar='N', type=int,
+      help='commitni po kazdych N infolistoch; chybny infolist sa vrati spat a preskoci')
+    parser.add_argument('--checkpoint', dest='checkpoint', metavar='SUBOR',
+      help='pri --commit-every si pamataj stav importu v SUBORe a pri dalsom spusteni pokracuj')
+    parser.add_argument('--cache', dest='cache', metavar='ADRESAR',
+      help='ukladaj sparsovane subory do ADRESARa a pri dalsom spusteni ich ber odtial')
+    parser.add_argument('--cache-max-mb', dest='cache_max_mb', metavar='MB', type=int, default=512,
+      help='maximalna velkost cache, najdlhsie nepouzite zaznamy sa mazu (predvolene 512)')
+    parser.add_argument('--pipeline', dest='pipeline', metavar='N', type=int, default=0,
+      help='parsuj v samostatnom procese sucasne so zapisom do DB, najviac N infolistov dopredu')
+    parser.add_argument('--db-workers', dest='db_workers', metavar='N', type=int, default=0,
+      help='zapisuj do DB v N procesoch s vlastnymi spojeniami, commit je spolocny na konci')
+    parser.add_argument('--update', dest='aktualizuj', action='store_true',
+      help='existujuce infolisty porovnaj s poslednou verziou v DB a pri zmene zapis novu verziu')
+    parser.add_argument('--uroven', dest='uroven', choices=UROVNE, default='info',
+      help='vypisuj iba diagnostiku aspon tejto urovne (predvolene info, debug vypise aj kod2skratka)')
+    parser.add_argument('--diagnostika', dest='diagnostika', metavar='SUBOR',
+      help='zapis diagnostiku ako JSON po riadkoch do SUBORu (- = stderr)')
+    parser.add_argument('--validate-only', dest='validate_only', metavar='SUBOR', nargs='?', const='-',
+      help='iba skontroluj subory (bez DB) a zapis report ako JSON do SUBORu (predvolene stdout)')
 
     args = parser.parse_args()
+    if args.user is None and args.validate_only is None:
+      parser.error('treba zadat pouzivatela (user)')
+    if args.commit_every is not None and args.engine == 'copy':
+      parser.error('--commit-every sa neda pouzit s --engine copy')
+    if args.checkpoint and args.commit_every is None:
+      parser.error('--checkpoint ma zmysel iba s --commit-every')
+    if args.db_workers > 1 and (args.engine == 'copy' or args.commit_every is not None):
+      parser.error('--db-workers sa neda pouzit s --engine copy ani s --commit-every')
+    if args.aktualizuj and (args.engine == 'copy' or args.db_workers > 1):
+      parser.error('--update sa neda pouzit s --engine copy ani s --db-workers')
+    preklady = []
+    for preklad in args.preklad:
+      jazyk, sep, adresar = preklad.partition('=')
+      if not sep or not jazyk or not adresar:
+        parser.error('--preklad treba zadat ako JAZYK=ADRESAR')
+      if jazyk == args.lang or jazyk in [j for j, subory in preklady]:
+        parser.error('jazyk {} je zadany viackrat'.format(jazyk))
+      preklady.append((jazyk, sorted(glob.glob(os.path.join(adresar, '*.xml')))))
 
     xml_path = os.path.join(args.input_path, '*.xml')
-    filenames = glob.glob(xml_path)
+    filenames = sorted(glob.glob(xml_path))
     iba_kody = None
     if args.iba_kody:
       iba_kody = re.compile(args.iba_kody)
+
+    if args.validate_only is not None:
+      report = validate(filenames, jobs=args.jobs, iba_kody=iba_kody, lang=args.lang,
+                        vsetky_polia=args.vsetky_polia)
+      if args.validate_only == '-':
+        json.dump(report, sys.stdout, indent=1, sort_keys=True)
+        print()
+      else:
+        with open(args.validate_only, 'w') as f:
+          json.dump(report, f, indent=1, sort_keys=True)
+      sys.stderr.write('Skontrolovanych {} suborov, {} infolistov: {} chyb, {} varovani\n'.format(
+        report['subory'], report['infolisty'], report['chyby'], report['varovania']))
+      sys.exit(1 if report['chyby'] else 0)
     
-    main(filenames, args.user, iba_kody=iba_kody, lang=args.lang, dry_run=args.dry_run)
+    sys.exit(main(filenames, args.user, iba_kody=iba_kody, lang=args.lang, dry_run=args.dry_run,
+      jobs=args.jobs, engine=args.engine,
+      manifest=Manifest(args.manifest) if args.manifest else None,
+      vsetky_polia=args.vsetky_polia, profile=args.profile,
+      diagnostika=args.diagnostika, uroven=args.uroven,
+      commit_every=args.commit_every,
+      checkpoint=Checkpoint(args.checkpoint) if args.checkpoint else None,
+      cache=Cache(args.cache, args.cache_max_mb * 1024 * 1024) if args.cache else None,
+      pipeline=args.pipeline, preklady=preklady, db_workers=args.db_workers,
+      aktualizuj=args.aktualizuj))
 